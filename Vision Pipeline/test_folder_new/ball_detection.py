@@ -1,30 +1,261 @@
 import cv2
 import numpy as np
+from color_lut import ColorLUT
 
 class BallDetector:
-    def __init__(self, lower_color_range, upper_color_range):
-        self.lower_color = np.array(lower_color_range)
-        self.upper_color = np.array(upper_color_range)
+    def __init__(self, lower_color_range, upper_color_range, max_misses=5, gate_sigma=3.0, min_window=64,
+                 color_engine="hsv", lut_bits=6, motion_filter=None, min_circularity=0.0, min_inertia=0.0,
+                 min_area=500, pyramid_levels=0):
+        """
+        Initializes the color-based ball detector.
+
+        Parameters:
+        - lower_color_range: Lower HSV bound of the ball color.
+        - upper_color_range: Upper HSV bound of the ball color.
+        - max_misses: Consecutive misses inside the tracking window before
+          detect_ball_tracked() falls back to a full-frame search.
+        - gate_sigma: Size of the tracking window in standard deviations of the
+          predicted position.
+        - min_window: Minimum half-size of the tracking window (in pixels).
+        - color_engine: "hsv" (default) converts every frame with cvtColor/inRange;
+          "lut" opts in to a precomputed BGR lookup table (see ColorLUT for its
+          tolerance and measured speed).
+        - lut_bits: Bits per BGR channel of the lookup table.
+        - motion_filter: Optional MotionFilter. Only ball-colored pixels that
+          also move survive, which removes static ball-colored objects.
+        - min_circularity: Minimum 4*pi*area/perimeter^2 of a candidate (1 for a disc).
+        - min_inertia: Minimum side ratio of the rotated bounding rectangle
+          of a candidate, as contourWithinInertia in the Orbbec notebook.
+          With either minimum set, the candidate with the best area x
+          circularity x inertia score wins instead of the largest.
+        - min_area: Minimum contour area of the ball (in full-resolution pixels).
+        - pyramid_levels: Full-frame searches run on the frame downscaled by
+          2^pyramid_levels, with min_area scaled to match; the candidate is
+          then segmented again in a full-resolution crop around it, so the
+          result keeps full-resolution accuracy. Tracking windows are always
+          searched at full resolution.
+
+        Centers are float centroids from the contour moments, not the
+        bounding box center, and are accurate to a fraction of a pixel.
+        """
+        if color_engine not in ("hsv", "lut"):
+            raise ValueError("Color engine must be 'hsv' or 'lut'.")
+        self.color_range = (np.array(lower_color_range), np.array(upper_color_range))
         self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        self.coarse_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))  # For downscaled frames
+        self.color_lut = ColorLUT(*self.color_range, lut_bits) if color_engine == "lut" else None
+        self.max_misses = max_misses
+        self.gate_sigma = gate_sigma
+        self.min_window = min_window
+        self.motion_filter = motion_filter
+        self.min_circularity = min_circularity
+        self.min_inertia = min_inertia
+        self.min_area = min_area
+        self.pyramid_levels = pyramid_levels
+        self.contour_count = 0  # Contours found by the last detection
+        self.misses = max_misses  # Start unlocked, i.e. with a full-frame search
+        self.last_size = None
+        self.last_window = None
+
+    @property
+    def lower_color(self):
+        return self.color_range[0]
+
+    @property
+    def upper_color(self):
+        return self.color_range[1]
+
+    def set_color_range(self, lower_color_range, upper_color_range):
+        """
+        Replaces the HSV range. Safe to call from another thread (e.g. ColorTuner):
+        the lookup table is built first, and detection sees either the old or
+        the new range, never a mix of both.
+        """
+        color_range = (np.array(lower_color_range), np.array(upper_color_range))
+        if self.color_lut is not None:
+            self.color_lut.set_range(*color_range)
+        self.color_range = color_range
+
+    def color_mask(self, frame):
+        if self.color_lut is not None:
+            return self.color_lut.mask(frame)
 
-    def detect_ball(self, frame):
         # Convert frame to HSV
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
+
         # Create a mask for the color range
-        mask = cv2.inRange(hsv, self.lower_color, self.upper_color)
+        lower_color, upper_color = self.color_range
+        return cv2.inRange(hsv, lower_color, upper_color)
+
+    def find_contours(self, frame, motion_mask=None, kernel=None):
+        mask = self.color_mask(frame)
+        if motion_mask is not None:
+            cv2.bitwise_and(mask, motion_mask, dst=mask)
         
         # Apply morphological operations
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
-        
-        # Find contours
-        contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        kernel = kernel if kernel is not None else self.kernel
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
         
-        if contours:
-            max_contour = max(contours, key=cv2.contourArea)
-            if cv2.contourArea(max_contour) > 500:  # Minimum area threshold
-                x, y, w, h = cv2.boundingRect(max_contour)
-                center = (x + w // 2, y + h // 2)
-                return center, (x, y, w, h)
-        return None, None
+        # Only outer contours; holes inside a blob are never candidates
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    def shape_score(self, contour, area):
+        """
+        Returns area x circularity x inertia ratio of a contour, or 0 if it fails the minimums.
+        """
+        perimeter = cv2.arcLength(contour, True)
+        circularity = 4 * np.pi * area / (perimeter * perimeter) if perimeter > 0 else 0.0
+        _, (width, height), _ = cv2.minAreaRect(contour)
+        inertia = min(width, height) / max(width, height) if min(width, height) > 0 else 0.0
+        if circularity < self.min_circularity or inertia < self.min_inertia:
+            return 0.0
+        return area * circularity * inertia
+
+    def _candidates(self, frame, motion_mask, min_area, kernel=None):
+        # (score, contour) of the contours above min_area, best first
+        contours = self.find_contours(frame, motion_mask, kernel)
+        self.contour_count = len(contours)
+        candidates = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area <= min_area:
+                continue
+            score = self.shape_score(contour, area) if self.min_circularity or self.min_inertia else area
+            if score > 0:
+                candidates.append((score, contour))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return candidates
+
+    def _motion_mask(self, frame):
+        # Updates the motion filter, if any, with a full frame
+        if self.motion_filter is None:
+            return None
+        self.motion_filter.apply(frame)
+        return self.motion_filter.mask()
+
+    @staticmethod
+    def _locate(contour, offset=(0, 0), factor=1):
+        """
+        Returns the float centroid and the bounding box of a contour, scaled
+        by factor and moved by offset into full-frame coordinates.
+        """
+        x, y, w, h = cv2.boundingRect(contour)
+        moments = cv2.moments(contour)
+        if moments["m00"] > 0:
+            center_x, center_y = moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
+        else:  # Degenerate contour (a line), use its box
+            center_x, center_y = x + w / 2, y + h / 2
+        center = (center_x * factor + offset[0], center_y * factor + offset[1])
+        return center, (x * factor + offset[0], y * factor + offset[1], w * factor, h * factor)
+
+    def _detect(self, frame, motion_mask, levels):
+        frame_height, frame_width = frame.shape[:2]
+        factor = 1 << levels
+        if levels == 0 or min(frame_height, frame_width) < 32 * factor:
+            candidates = self._candidates(frame, motion_mask, self.min_area)
+            return self._locate(candidates[0][1]) if candidates else (None, None)
+
+        # Coarse: find the best candidate on the downscaled frame
+        size = (frame_width // factor, frame_height // factor)
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        small_motion = cv2.resize(motion_mask, size, interpolation=cv2.INTER_NEAREST) if motion_mask is not None else None
+        candidates = self._candidates(small, small_motion, self.min_area / (factor * factor), self.coarse_kernel)
+        coarse_count = self.contour_count
+        if not candidates:
+            return None, None
+
+        # Fine: segment a full-resolution crop around it
+        x, y, w, h = cv2.boundingRect(candidates[0][1])
+        margin = 2 * factor
+        x0, y0 = max(0, x * factor - margin), max(0, y * factor - margin)
+        x1, y1 = min(frame_width, (x + w) * factor + margin), min(frame_height, (y + h) * factor + margin)
+        crop_motion = motion_mask[y0:y1, x0:x1] if motion_mask is not None else None
+        # The full-resolution contour has the final say on area and shape
+        candidates = self._candidates(frame[y0:y1, x0:x1], crop_motion, self.min_area)
+        self.contour_count += coarse_count
+        return self._locate(candidates[0][1], (x0, y0)) if candidates else (None, None)
+
+    def detect_ball(self, frame, motion_mask=None):
+        """
+        Detects the best ball candidate in the frame.
+
+        Parameters:
+        - frame: The input BGR frame.
+        - motion_mask: Motion mask of the frame. Without it the motion
+          filter, if any, is updated with this frame.
+
+        Returns:
+        - center: Float (x, y) centroid, or None.
+        - bounding_box: Integer (x, y, w, h) box, or None.
+        """
+        if motion_mask is None:
+            motion_mask = self._motion_mask(frame)
+        return self._detect(frame, motion_mask, self.pyramid_levels)
+
+    def detect_balls(self, frame, min_area=None):
+        """
+        Detects every ball-colored blob in the frame.
+
+        Parameters:
+        - frame: The input BGR frame.
+        - min_area: Minimum contour area of a candidate (in pixels); defaults to self.min_area.
+
+        Returns:
+        - A list of (center, bounding_box) tuples, best candidate first.
+        """
+        min_area = self.min_area if min_area is None else min_area
+        candidates = self._candidates(frame, self._motion_mask(frame), min_area)
+        return [self._locate(contour) for _, contour in candidates]
+
+    def detect_ball_tracked(self, frame, predicted_center, position_covariance):
+        """
+        Detects the ball inside a window gated around the tracker prediction.
+
+        Only the window is converted and segmented, which is far cheaper than
+        processing the full frame once the ball is locked. After max_misses
+        consecutive misses the detector searches the full frame again.
+
+        Parameters:
+        - frame: The input BGR frame.
+        - predicted_center: The (x, y) position predicted by MotionTracker.
+        - position_covariance: The 2x2 covariance of the predicted position.
+
+        Returns:
+        - center, bounding_box in full-frame coordinates, or (None, None).
+        """
+        self.last_window = None
+        # The background model sees every full frame, also while only a window is searched
+        if self.motion_filter is not None:
+            self.motion_filter.apply(frame)
+        if predicted_center is None or position_covariance is None or self.misses >= self.max_misses:
+            motion_mask = self.motion_filter.mask() if self.motion_filter is not None else None
+            center, bounding_box = self._detect(frame, motion_mask, self.pyramid_levels)
+            self.misses = 0 if center else self.max_misses
+            self.last_size = (bounding_box[2], bounding_box[3]) if bounding_box else None
+            return center, bounding_box
+
+        frame_height, frame_width = frame.shape[:2]
+        std_x, std_y = np.sqrt(np.maximum(np.diagonal(position_covariance), 0))
+        ball_w, ball_h = self.last_size
+        half_w = max(self.min_window, int(self.gate_sigma * std_x) + ball_w)
+        half_h = max(self.min_window, int(self.gate_sigma * std_y) + ball_h)
+        px, py = int(predicted_center[0]), int(predicted_center[1])
+        x0, x1 = max(0, px - half_w), min(frame_width, px + half_w)
+        y0, y1 = max(0, py - half_h), min(frame_height, py + half_h)
+
+        center, bounding_box = None, None
+        if x1 > x0 and y1 > y0:
+            self.last_window = (x0, y0, x1 - x0, y1 - y0)
+            window_mask = self.motion_filter.mask(self.last_window) if self.motion_filter is not None else None
+            center, bounding_box = self._detect(frame[y0:y1, x0:x1], window_mask, 0)
+
+        if center is None:
+            self.misses += 1
+            return None, None
+
+        self.misses = 0
+        x, y, w, h = bounding_box
+        self.last_size = (w, h)
+        return (center[0] + x0, center[1] + y0), (x + x0, y + y0, w, h)
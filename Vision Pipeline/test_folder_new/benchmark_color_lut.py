@@ -0,0 +1,50 @@
+import sys
+import time
+import cv2
+import numpy as np
+from color_lut import ColorLUT
+
+# Compares the cvtColor/inRange mask of BallDetector with the ColorLUT engine.
+# Usage: python benchmark_color_lut.py [image_path]
+
+lower_color = np.array([40, 70, 70])
+upper_color = np.array([80, 255, 255])
+iterations = 100
+
+
+def synthetic_frame(width=1200, height=720):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_LINEAR)
+    cv2.circle(frame, (width // 2, height // 2), 40, (40, 200, 60), -1)
+    noise = rng.normal(0, 8, frame.shape)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def time_per_frame(function, frame):
+    function(frame)  # Warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(frame)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+if __name__ == "__main__":
+    frame = cv2.imread(sys.argv[1]) if len(sys.argv) > 1 else synthetic_frame()
+    if frame is None:
+        raise Exception("Error: Could not read image.")
+
+    def hsv_mask(image):
+        return cv2.inRange(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), lower_color, upper_color)
+
+    reference = hsv_mask(frame)
+    print(f"Frame: {frame.shape[1]}x{frame.shape[0]}, {iterations} iterations")
+    print(f"cvtColor + inRange: {time_per_frame(hsv_mask, frame):.3f} ms/frame")
+
+    for bits in (5, 6, 8):
+        start = time.perf_counter()
+        lut = ColorLUT(lower_color, upper_color, bits=bits)
+        build_ms = (time.perf_counter() - start) * 1000
+        mismatch = np.count_nonzero(lut.mask(frame) != reference) / reference.size * 100
+        print(f"LUT {1 << bits}^3 bins: {time_per_frame(lut.mask, frame):.3f} ms/frame, "
+              f"build {build_ms:.1f} ms, mismatched pixels {mismatch:.3f}%")
@@ -0,0 +1,93 @@
+import time
+import numpy as np
+from ball_detection import BallDetector
+from color_tuner import ColorTuner
+from motion_tracking import MotionTracker
+from synthetic_scene import SyntheticScene
+
+# Compares the fixed HSV range with the ColorTuner on synthetic throws in
+# steady and in slowly dimming light: detection recall, false detections and
+# the cost of detection per frame in the tracking loop (detect_ball_tracked
+# plus ColorTuner.observe; the worker thread is not counted, it is off the
+# loop). The tuner and the detector persist across throws, as in a live run.
+# Usage: python benchmark_color_tuner.py
+
+lower_color, upper_color = [40, 70, 70], [80, 255, 255]
+
+scenarios = {
+    "steady light": {},
+    "dimming 10%/s": {"dimming": 0.1},
+}
+
+configurations = {
+    "fixed range": {},
+    "tuner, inline": {"tuner": True, "threaded": False},
+    "tuner, worker thread": {"tuner": True, "threaded": True},
+}
+
+
+def run(configuration, scene):
+    dt = 1.0 / scene.fps
+    detector = BallDetector(lower_color, upper_color)
+    tuner = None
+    if configuration.get("tuner"):
+        tuner = ColorTuner(detector, threaded=configuration["threaded"]).start()
+    visible = hits = false_detections = frames = 0
+    elapsed = 0.0
+    flight = None
+
+    for frame, _, truth in scene.frames():
+        if truth["flight"] != flight:
+            flight = truth["flight"]
+            tracker = MotionTracker(backend="numpy")
+            corrections = 0
+
+        start = time.perf_counter()
+        predicted = tracker.predict(dt)
+        if corrections:
+            center, bounding_box = detector.detect_ball_tracked(frame, predicted, tracker.position_covariance())
+        else:
+            center, bounding_box = detector.detect_ball(frame)
+        if center:
+            tracker.correct(center)
+            corrections += 1
+            if tuner is not None:
+                tuner.observe(frame, bounding_box)
+        elapsed += time.perf_counter() - start
+        frames += 1
+
+        position = truth["position"]
+        on_ball = center is not None and position is not None and \
+            np.hypot(center[0] - position[0], center[1] - position[1]) <= truth["radius"]
+        if center is not None and not on_ball:
+            false_detections += 1
+        if position is None or truth["visible"] < 0.5:
+            continue
+        visible += 1
+        hits += on_ball
+
+    stats = None
+    if tuner is not None:
+        tuner.stop()
+        stats = tuner.stats()
+    return {
+        "recall": hits / visible if visible else float("nan"),
+        "false": false_detections / frames,
+        "ms": elapsed / frames * 1000,
+        "stats": stats,
+    }
+
+
+if __name__ == "__main__":
+    print("1200x720, 12 throws (18 s) per scenario, noise 4.")
+    for scenario, options in scenarios.items():
+        print(f"\n{scenario}")
+        print(f"  {'configuration':<24}{'recall':>8}{'false':>8}{'ms/frame':>10}{'updates':>9}  final range")
+        for name, configuration in configurations.items():
+            scene = SyntheticScene(1200, 720, flights=12, noise=4, seed=5, **options)
+            result = run(configuration, scene)
+            stats = result["stats"]
+            updates = f"{stats['published']}/{stats['published'] + stats['rejected']}" if stats else "-"
+            final_range = f"{stats['lower']}-{stats['upper']}" if stats else f"{lower_color}-{upper_color}"
+            print(f"  {name:<24}{result['recall']:>8.2f}{result['false']:>8.2f}{result['ms']:>10.2f}{updates:>9}"
+                  f"  {final_range}")
@@ -0,0 +1,85 @@
+import time
+import numpy as np
+from kalman_filter import ConstantAccelerationKalman
+from motion_tracking import MotionTracker
+
+# Compares the OpenCV-backed MotionTracker with the NumPy constant-acceleration
+# filter on a simulated throw: prediction accuracy, per-call cost and batching.
+
+fps = 30
+dt = 1 / fps
+noise = 2.0  # Detection noise (pixels)
+gravity = 1500.0  # Pixels/s^2 for a ball about 2 m from the camera
+iterations = 2000
+batch_size = 100
+
+
+def simulated_throw(frames=45, seed=0):
+    t = np.arange(frames) * dt
+    x = 100 + 600 * t
+    y = 650 - 900 * t + 0.5 * gravity * t ** 2
+    truth = np.stack([x, y], axis=1)
+    detections = truth + np.random.default_rng(seed).normal(0, noise, truth.shape)
+    return truth, detections
+
+
+def prediction_rmse(tracker, truth, detections):
+    errors = []
+    for i, detection in enumerate(detections):
+        predicted = tracker.predict(dt) if tracker.backend == "numpy" else tracker.predict()
+        if i >= 5:  # Skip the initial convergence
+            errors.append(np.hypot(*(np.array(predicted) - truth[i])))
+        tracker.correct(detection)
+    return float(np.sqrt(np.mean(np.square(errors))))
+
+
+def time_per_step(step, count=iterations):
+    start = time.perf_counter()
+    for _ in range(count):
+        step()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+if __name__ == "__main__":
+    truth, detections = simulated_throw()
+    print(f"One-step prediction RMSE on a simulated throw ({noise:.0f} px detection noise):")
+    print(f"  opencv constant velocity:     {prediction_rmse(MotionTracker('opencv'), truth, detections):.2f} px")
+    print(f"  numpy constant acceleration:  {prediction_rmse(MotionTracker('numpy'), truth, detections):.2f} px")
+    print(f"  numpy with gravity prior:     "
+          f"{prediction_rmse(MotionTracker('numpy', gravity=gravity), truth, detections):.2f} px")
+
+    measurement = (320.0, 240.0)
+    opencv_tracker = MotionTracker("opencv")
+    numpy_tracker = MotionTracker("numpy")
+    numpy_tracker.correct(measurement)
+
+    def opencv_step():
+        opencv_tracker.predict()
+        opencv_tracker.correct(measurement)
+
+    def numpy_step():
+        numpy_tracker.predict(dt)
+        numpy_tracker.correct(measurement)
+
+    print("Single track, predict + correct:")
+    print(f"  opencv MotionTracker: {time_per_step(opencv_step):.1f} us")
+    print(f"  numpy MotionTracker:  {time_per_step(numpy_step):.1f} us")
+
+    opencv_trackers = [MotionTracker("opencv") for _ in range(batch_size)]
+    batch_filter = ConstantAccelerationKalman(n_tracks=batch_size)
+    batch_measurements = np.random.default_rng(1).uniform(0, 720, (batch_size, 2))
+    for i in range(batch_size):
+        batch_filter.reset(i, batch_measurements[i])
+
+    def opencv_batch_step():
+        for tracker, point in zip(opencv_trackers, batch_measurements):
+            tracker.predict()
+            tracker.correct(point)
+
+    def numpy_batch_step():
+        batch_filter.predict(dt)
+        batch_filter.correct(batch_measurements)
+
+    print(f"{batch_size} tracks, predict + correct:")
+    print(f"  {batch_size} opencv MotionTrackers:   {time_per_step(opencv_batch_step, 200):.1f} us")
+    print(f"  batched ConstantAccelerationKalman: {time_per_step(numpy_batch_step, 200):.1f} us")
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import numpy as np
+from depth_map import DepthMap
+from synthetic_scene import SyntheticScene
+
+# Compares the DepthMap stereo engines on a synthetic stereo pair at 1200x720:
+# quality against the true disparities and dense depth map throughput. The
+# tiled engine is run with 2, 4 and (if more) all CPUs.
+# Usage: python benchmark_stereo_engines.py [block_size]
+
+iterations = 10
+
+
+def scene_pair():
+    # One frame in mid-flight, with sensor noise; the ball is the only object in front of the background
+    scene = SyntheticScene(1200, 720, flights=1, stereo=True, noise=4, seed=3)
+    for index, (left, right, truth) in enumerate(scene.frames()):
+        if index == 15:
+            return scene, left, right, truth
+
+
+def quality(depth_map, scene, left, right, truth):
+    # Background pixels: all but the ball and the columns without a full disparity search
+    disparity = depth_map.focal_length * depth_map.baseline / depth_map.compute_depth_map(left, right)
+    x, y = truth["position"]
+    radius = truth["radius"] + depth_map.block_size
+    rows, columns = np.ogrid[:scene.height, :scene.width]
+    background = (np.hypot(columns - x, rows - y) > radius) & (columns >= depth_map.num_disparities)
+    valid = background & (disparity > 0.5)
+    bad = np.abs(disparity - scene.background_disparity) > 1
+    distance, _ = depth_map.estimate_depth_in_box(left, right, (int(x - truth["radius"]), int(y - truth["radius"]),
+                                                                int(2 * truth["radius"]), int(2 * truth["radius"])))
+    return {
+        "valid": np.count_nonzero(valid) / np.count_nonzero(background) * 100,
+        "bad": np.count_nonzero(valid & bad) / max(1, np.count_nonzero(valid)) * 100,
+        "ball": abs(distance - truth["depth"]) / truth["depth"] * 100 if distance is not None else float("nan"),
+    }
+
+
+def frames_per_second(depth_map, left, right):
+    depth_map.compute_depth_map(left, right)  # Warm-up, allocates the buffers
+    start = time.perf_counter()
+    for _ in range(iterations):
+        depth_map.compute_depth_map(left, right)
+    return iterations / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    block_size = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    scene, left, right, truth = scene_pair()
+    cpus = os.cpu_count() or 1
+    engines = {"bm": {"engine": "bm"}, "sgbm": {"engine": "sgbm"}}
+    for workers in sorted({2, 4, cpus}):
+        engines[f"tiled_sgbm, {workers} workers"] = {"engine": "tiled_sgbm", "workers": workers}
+
+    print(f"1200x720, block size {block_size}, {cpus} CPUs. Background disparity {scene.background_disparity} px, "
+          f"ball at {truth['depth']:.2f} m.")
+    print(f"  {'engine':<26}{'valid %':>9}{'bad %':>8}{'ball depth %':>14}{'fps':>8}{'same as sgbm %':>16}")
+    sgbm_disparity = None
+    for name, options in engines.items():
+        depth_map = DepthMap(scene.baseline, scene.focal_length, block_size=block_size, **options)
+        result = quality(depth_map, scene, left, right, truth)
+        fps = frames_per_second(depth_map, left, right)
+        disparity = depth_map.compute_depth_map(left, right).copy()
+        if options["engine"] == "sgbm":
+            sgbm_disparity = disparity
+        same = np.mean(disparity == sgbm_disparity) * 100 if options["engine"] != "bm" else float("nan")
+        depth_map.close()
+        print(f"  {name:<26}{result['valid']:>9.1f}{result['bad']:>8.1f}{result['ball']:>14.1f}{fps:>8.1f}"
+              f"{same:>16.2f}")
@@ -0,0 +1,142 @@
+import sys
+import time
+import numpy as np
+from ball_detection import BallDetector
+from depth_map import DepthMap
+from motion_filter import MotionFilter
+from motion_tracking import MotionTracker
+from multi_tracker import MultiTracker
+from synthetic_scene import SyntheticScene
+from trajectory_prediction import TrajectoryPredictor
+
+# Scores pipeline configurations against the ground truth of synthetic throws:
+# detection recall, Kalman prediction RMSE, landing error, depth error, FPS
+# the mean number of contours the detector processed per frame, and the mean
+# error of the detected ball center.
+# The "multi tracker" configuration tracks every candidate with the batched
+# MultiTracker and follows the track of the best candidate; it scores the
+# filtered position of that track, which coasts for max_misses frames after
+# the ball is gone (counted as false detections), and has no one-step
+# prediction RMSE.
+# Only the pipeline is timed, not the rendering.
+# Usage: python benchmark_synthetic.py [width height]
+
+lower_color, upper_color = [40, 70, 70], [80, 255, 255]
+
+scenarios = {
+    "clean": {},
+    "noise + lighting": {"noise": 8, "lighting": 0.4},
+    "occlusion + distractors": {"occluders": 2, "distractors": 3},
+    "static green clutter": {"clutter": 4},
+}
+
+configurations = {
+    "full frame, opencv kalman": {"backend": "opencv"},
+    "full frame, numpy kalman": {"backend": "numpy"},
+    "full frame, 2-level pyramid": {"backend": "numpy", "pyramid_levels": 2},
+    "tracked window, numpy kalman": {"backend": "numpy", "tracked": True},
+    "tracked window, lut colors": {"backend": "numpy", "tracked": True, "color_engine": "lut"},
+    "tracked window + sparse depth": {"backend": "numpy", "tracked": True, "depth": True},
+    "tracked window + motion filter": {"backend": "numpy", "tracked": True, "motion": True},
+    "motion filter + shape scoring": {"backend": "numpy", "tracked": True, "motion": True, "shape": True},
+    "all candidates, multi tracker": {"backend": "numpy", "multi": True},
+}
+
+
+def run(configuration, scene):
+    dt = 1.0 / scene.fps
+    depth_estimator = DepthMap(scene.baseline, scene.focal_length) if configuration.get("depth") else None
+    # The background model persists across throws, like in a live run
+    motion_filter = MotionFilter() if configuration.get("motion") else None
+    shape = {"min_circularity": 0.5, "min_inertia": 0.5} if configuration.get("shape") else {}
+    visible = hits = false_detections = frames = contours = 0
+    prediction_errors, landing_errors, depth_errors, center_errors = [], [], [], []
+    elapsed = 0.0
+    flight = None
+
+    for frame, right_frame, truth in scene.frames():
+        if truth["flight"] != flight:
+            # Every throw starts from a fresh tracker, so the scores are per flight
+            flight = truth["flight"]
+            detector = BallDetector(lower_color, upper_color, color_engine=configuration.get("color_engine", "hsv"),
+                                    motion_filter=motion_filter, pyramid_levels=configuration.get("pyramid_levels", 0),
+                                    **shape)
+            tracker = MotionTracker(backend=configuration["backend"])
+            multi_tracker = MultiTracker(default_dt=dt)
+            followed = None
+            predictor = TrajectoryPredictor()
+            corrections = 0
+
+        start = time.perf_counter()
+        if configuration.get("multi"):
+            predicted = None
+            candidates = detector.detect_balls(frame)
+            tracks = dict(multi_tracker.update([candidate for candidate, _ in candidates], dt))
+            if followed not in tracks and candidates:
+                # The best candidate either corrected a track or started one on itself
+                best = candidates[0][0]
+                followed = min(tracks, key=lambda track_id: np.hypot(tracks[track_id][0] - best[0],
+                                                                      tracks[track_id][1] - best[1]))
+            center, bounding_box = tracks.get(followed), None
+        else:
+            predicted = tracker.predict(dt)
+            if configuration.get("tracked") and corrections:
+                center, bounding_box = detector.detect_ball_tracked(frame, predicted, tracker.position_covariance())
+            else:
+                center, bounding_box = detector.detect_ball(frame)
+        if center:
+            if predicted is not None:
+                tracker.correct(center)
+            predictor.update_positions(center, truth["time"])
+            corrections += 1
+        landing = predictor.estimate_landing(scene.floor_y)
+        distance = None
+        if depth_estimator is not None and bounding_box:
+            distance, _ = depth_estimator.estimate_depth_in_box(frame, right_frame, bounding_box)
+        elapsed += time.perf_counter() - start
+        frames += 1
+        contours += detector.contour_count
+
+        position = truth["position"]
+        on_ball = center is not None and position is not None and \
+            np.hypot(center[0] - position[0], center[1] - position[1]) <= truth["radius"]
+        if center is not None and not on_ball:
+            false_detections += 1
+        if position is None or truth["visible"] < 0.5:
+            continue
+        visible += 1
+        hits += on_ball
+        if on_ball:
+            center_errors.append(np.hypot(center[0] - position[0], center[1] - position[1]))
+        if corrections >= 3 and predicted is not None:
+            prediction_errors.append(np.hypot(predicted[0] - position[0], predicted[1] - position[1]))
+        if landing is not None and truth["landing"][1] <= 0.5:
+            landing_errors.append(abs(landing[0] - truth["landing"][0]))
+        if distance is not None and on_ball:
+            depth_errors.append(abs(distance - truth["depth"]) / truth["depth"])
+
+    return {
+        "recall": hits / visible if visible else float("nan"),
+        "false": false_detections / frames,
+        "rmse": float(np.sqrt(np.mean(np.square(prediction_errors)))) if prediction_errors else float("nan"),
+        "landing": float(np.mean(landing_errors)) if landing_errors else float("nan"),
+        "depth": float(np.mean(depth_errors)) * 100 if depth_errors else float("nan"),
+        "fps": frames / elapsed,
+        "contours": contours / frames,
+        "center": float(np.mean(center_errors)) if center_errors else float("nan"),
+    }
+
+
+if __name__ == "__main__":
+    width, height = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (1200, 720)
+    print(f"{width}x{height}, 3 throws per scenario. Landing error is measured in the last 0.5 s of each flight.")
+    for scenario, options in scenarios.items():
+        print(f"\n{scenario}")
+        print(f"  {'configuration':<32}{'recall':>8}{'false':>8}{'rmse px':>9}{'landing px':>12}"
+              f"{'depth %':>9}{'fps':>8}{'contours':>10}{'center px':>11}")
+        for name, configuration in configurations.items():
+            scene = SyntheticScene(width, height, flights=3, stereo=True, seed=1, **options)
+            result = run(configuration, scene)
+            print(f"  {name:<32}{result['recall']:>8.2f}{result['false']:>8.2f}{result['rmse']:>9.1f}"
+                  f"{result['landing']:>12.1f}{result['depth']:>9.1f}{result['fps']:>8.0f}"
+                  f"{result['contours']:>10.1f}{result['center']:>11.2f}")
@@ -0,0 +1,73 @@
+import numpy as np
+from ball_detection import BallDetector
+from depth_source import OrbbecDepthSource
+from synthetic_scene import SyntheticScene
+from trajectory_3d import CameraModel, Trajectory3DPredictor
+from trajectory_prediction import TrajectoryPredictor
+
+# Compares the pixel landing prediction with the metric 3D one on synthetic
+# RGB-D throws, by how far off each is (in cm on the floor) as the flight
+# progresses. The pixel prediction is converted to meters at the true depth,
+# which the 2D predictor alone does not know; the 3D one is run with
+# increasing noise on the measured depth, as from a real sensor.
+# Usage: python benchmark_trajectory_3d.py
+
+lower_color, upper_color = [40, 70, 70], [80, 255, 255]
+checkpoints = (0.25, 0.5, 0.75)  # Fractions of the flight time elapsed
+depth_noises = (0.0, 0.01, 0.03)  # Relative 1-sigma noise added to the box depth
+
+
+def run(scene, depth_noise, rng):
+    camera = CameraModel(scene.focal_length, (scene.width / 2, scene.height / 2),
+                         height=(scene.floor_y - scene.height / 2) * scene.depth / scene.focal_length)
+    depth_source = OrbbecDepthSource(max_depth=scene.background_depth - 0.5)
+    detector = BallDetector(lower_color, upper_color)
+    errors = {name: {checkpoint: [] for checkpoint in checkpoints} for name in ("2d", "3d")}
+    flight = None
+
+    for frame, raw_depth, truth in scene.frames():
+        if truth["position"] is None:
+            continue
+        if truth["flight"] != flight:
+            flight = truth["flight"]
+            predictor = TrajectoryPredictor()
+            predictor_3d = Trajectory3DPredictor(camera)
+            flight_time = truth["landing"][1]
+            pending = list(checkpoints)
+
+        center, bounding_box = detector.detect_ball(frame)
+        if center:
+            predictor.update_positions(center, truth["time"])
+            distance, _ = depth_source.estimate_depth_in_box(frame, raw_depth, bounding_box)
+            if distance is not None:
+                distance *= 1 + depth_noise * rng.standard_normal()
+                predictor_3d.update_positions(center, distance, truth["time"])
+
+        progress = 1 - truth["landing"][1] / flight_time
+        while pending and progress >= pending[0]:
+            checkpoint = pending.pop(0)
+            true_x = camera.pixel_to_world((truth["landing"][0], scene.floor_y), scene.depth)[0]
+            landing = predictor.estimate_landing(scene.floor_y)
+            if landing is not None:
+                landing_x = camera.pixel_to_world((landing[0], scene.floor_y), scene.depth)[0]
+                errors["2d"][checkpoint].append(abs(landing_x - true_x) * 100)
+            landing_3d = predictor_3d.estimate_landing()
+            if landing_3d is not None:
+                errors["3d"][checkpoint].append(np.hypot(landing_3d[0] - true_x, landing_3d[1] - scene.depth) * 100)
+
+    return errors
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    scene = SyntheticScene(1200, 720, flights=5, rgbd=True, noise=4, seed=2)
+    print(f"5 throws at {scene.depth:.1f} m. Mean landing error (cm):")
+    print(f"  {'predictor':<28}" + "".join(f"{f'{int(c * 100)}% of flight':>16}" for c in checkpoints))
+    for depth_noise in depth_noises:
+        errors = run(scene, depth_noise, rng)
+        rows = {f"3d, {depth_noise * 100:.0f}% depth noise": errors["3d"]}
+        if depth_noise == 0:
+            rows = {"2d at the true depth": errors["2d"], **rows}
+        for name, row in rows.items():
+            print(f"  {name:<28}" + "".join(f"{np.mean(row[c]) if row[c] else float('nan'):>16.1f}"
+                                            for c in checkpoints))
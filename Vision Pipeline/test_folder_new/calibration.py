@@ -0,0 +1,166 @@
+import glob
+import sys
+import cv2
+import numpy as np
+
+
+class StereoCalibration:
+    def __init__(self, image_size, camera_matrix_left, dist_coeffs_left, camera_matrix_right, dist_coeffs_right,
+                 rotation, translation):
+        """
+        Intrinsics, distortion and extrinsics of a stereo camera pair.
+
+        The rectification transforms are derived once here; init_rectification()
+        precomputes the remap tables so rectifying a frame is a single cv2.remap.
+
+        Parameters:
+        - image_size: (width, height) of the calibrated images.
+        - camera_matrix_left, camera_matrix_right: 3x3 intrinsic matrices.
+        - dist_coeffs_left, dist_coeffs_right: Distortion coefficients.
+        - rotation: 3x3 rotation from the left to the right camera.
+        - translation: Translation from the left to the right camera (in meters).
+        """
+        self.image_size = tuple(int(v) for v in image_size)
+        self.camera_matrix_left = np.asarray(camera_matrix_left, dtype=np.float64)
+        self.dist_coeffs_left = np.asarray(dist_coeffs_left, dtype=np.float64)
+        self.camera_matrix_right = np.asarray(camera_matrix_right, dtype=np.float64)
+        self.dist_coeffs_right = np.asarray(dist_coeffs_right, dtype=np.float64)
+        self.rotation = np.asarray(rotation, dtype=np.float64)
+        self.translation = np.asarray(translation, dtype=np.float64).reshape(3, 1)
+
+        (self.rect_rotation_left, self.rect_rotation_right, self.projection_left, self.projection_right,
+         self.disparity_to_depth, _, _) = cv2.stereoRectify(
+            self.camera_matrix_left, self.dist_coeffs_left, self.camera_matrix_right, self.dist_coeffs_right,
+            self.image_size, self.rotation, self.translation, flags=cv2.CALIB_ZERO_DISPARITY)
+        self.maps_left = None
+        self.maps_right = None
+
+    @property
+    def focal_length(self):
+        """
+        Focal length of the rectified cameras (in pixels).
+        """
+        return float(self.projection_left[0, 0])
+
+    @property
+    def baseline(self):
+        """
+        Distance between the camera centers (in meters).
+        """
+        return float(np.linalg.norm(self.translation))
+
+    @classmethod
+    def from_checkerboard_images(cls, left_images, right_images, pattern_size=(9, 6), square_size=0.025):
+        """
+        Calibrates a stereo pair from recorded checkerboard image pairs.
+
+        Parameters:
+        - left_images, right_images: Lists of image paths (or BGR images), pairwise aligned.
+        - pattern_size: Number of inner corners per checkerboard row and column.
+        - square_size: Side length of a checkerboard square (in meters).
+
+        Returns:
+        - calibration: The StereoCalibration, with the reprojection error in `rms_error`.
+        """
+        pattern = np.zeros((pattern_size[0] * pattern_size[1], 3), np.float32)
+        pattern[:, :2] = np.mgrid[0:pattern_size[0], 0:pattern_size[1]].T.reshape(-1, 2) * square_size
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+        object_points, corners_left, corners_right = [], [], []
+        image_size = None
+        for left, right in zip(left_images, right_images):
+            gray_left = cls._load_gray(left)
+            gray_right = cls._load_gray(right)
+            image_size = (gray_left.shape[1], gray_left.shape[0])
+            found_left, points_left = cv2.findChessboardCorners(gray_left, pattern_size)
+            found_right, points_right = cv2.findChessboardCorners(gray_right, pattern_size)
+            if not (found_left and found_right):
+                continue
+            corners_left.append(cv2.cornerSubPix(gray_left, points_left, (5, 5), (-1, -1), criteria))
+            corners_right.append(cv2.cornerSubPix(gray_right, points_right, (5, 5), (-1, -1), criteria))
+            object_points.append(pattern)
+
+        if len(object_points) < 3:
+            raise ValueError("At least 3 image pairs with a detected checkerboard are required.")
+
+        _, matrix_left, dist_left, _, _ = cv2.calibrateCamera(object_points, corners_left, image_size, None, None)
+        _, matrix_right, dist_right, _, _ = cv2.calibrateCamera(object_points, corners_right, image_size, None, None)
+        rms_error, matrix_left, dist_left, matrix_right, dist_right, rotation, translation, _, _ = cv2.stereoCalibrate(
+            object_points, corners_left, corners_right, matrix_left, dist_left, matrix_right, dist_right,
+            image_size, criteria=criteria, flags=cv2.CALIB_FIX_INTRINSIC)
+
+        calibration = cls(image_size, matrix_left, dist_left, matrix_right, dist_right, rotation, translation)
+        calibration.rms_error = rms_error
+        return calibration
+
+    @staticmethod
+    def _load_gray(image):
+        if isinstance(image, str):
+            image = cv2.imread(image)
+            if image is None:
+                raise ValueError("Could not read calibration image.")
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+    def save(self, path):
+        """
+        Saves the calibration to a .npz file.
+        """
+        np.savez(path, image_size=self.image_size,
+                 camera_matrix_left=self.camera_matrix_left, dist_coeffs_left=self.dist_coeffs_left,
+                 camera_matrix_right=self.camera_matrix_right, dist_coeffs_right=self.dist_coeffs_right,
+                 rotation=self.rotation, translation=self.translation)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a calibration saved with save().
+        """
+        with np.load(path) as data:
+            return cls(data["image_size"], data["camera_matrix_left"], data["dist_coeffs_left"],
+                       data["camera_matrix_right"], data["dist_coeffs_right"],
+                       data["rotation"], data["translation"])
+
+    def init_rectification(self):
+        """
+        Precomputes the undistort/rectify remap tables (fixed-point, for the fastest remap).
+        """
+        self.maps_left = cv2.initUndistortRectifyMap(
+            self.camera_matrix_left, self.dist_coeffs_left, self.rect_rotation_left,
+            self.projection_left, self.image_size, cv2.CV_16SC2)
+        self.maps_right = cv2.initUndistortRectifyMap(
+            self.camera_matrix_right, self.dist_coeffs_right, self.rect_rotation_right,
+            self.projection_right, self.image_size, cv2.CV_16SC2)
+
+    def rectify(self, left_frame, right_frame, roi=None):
+        """
+        Undistorts and rectifies a stereo pair with one remap per frame.
+
+        Parameters:
+        - left_frame: Frame from the left camera.
+        - right_frame: Frame from the right camera.
+        - roi: Optional (x, y, w, h) region of the rectified images to produce;
+          only the remap tables of that region are evaluated.
+
+        Returns:
+        - rectified_left, rectified_right: The rectified frames (or regions).
+        """
+        if self.maps_left is None:
+            self.init_rectification()
+        maps_left, maps_right = self.maps_left, self.maps_right
+        if roi is not None:
+            x, y, w, h = roi
+            maps_left = tuple(m[y:y + h, x:x + w] for m in maps_left)
+            maps_right = tuple(m[y:y + h, x:x + w] for m in maps_right)
+        rectified_left = cv2.remap(left_frame, maps_left[0], maps_left[1], cv2.INTER_LINEAR)
+        rectified_right = cv2.remap(right_frame, maps_right[0], maps_right[1], cv2.INTER_LINEAR)
+        return rectified_left, rectified_right
+
+
+if __name__ == "__main__":
+    # Usage: python calibration.py "left/*.png" "right/*.png" stereo_calibration.npz
+    left_paths = sorted(glob.glob(sys.argv[1]))
+    right_paths = sorted(glob.glob(sys.argv[2]))
+    stereo_calibration = StereoCalibration.from_checkerboard_images(left_paths, right_paths)
+    stereo_calibration.save(sys.argv[3])
+    print(f"RMS reprojection error: {stereo_calibration.rms_error:.3f} px, "
+          f"focal length: {stereo_calibration.focal_length:.1f} px, baseline: {stereo_calibration.baseline:.3f} m")
@@ -1,26 +1,189 @@
 import cv2
+import threading
+from collections import deque
+from frame_source import CameraSource, EndOfStream, capture_clock, read_timestamped, stream_ended
+
+
+class FrameGrabber:
+    def __init__(self, cap, buffer_size=2):
+        """
+        Reads frames from a capture device on a background thread.
+
+        Only the freshest frames are kept: once the ring buffer is full the
+        oldest entry is overwritten, so the consumer never sees stale frames.
+
+        Parameters:
+        - cap: An opened capture object exposing read() and release().
+        - buffer_size: Number of most recent frames kept in the ring buffer.
+        """
+        if buffer_size < 1:
+            raise ValueError("Buffer size must be at least 1.")
+        self.cap = cap
+        self.buffer = deque(maxlen=buffer_size)  # (sequence, timestamp, frame)
+        self.condition = threading.Condition()
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.last_read_sequence = 0
+        self.error = None
+        self.ended = False  # The error is the end of a finite stream
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while self.running:
+            ret, frame, timestamp = read_timestamped(self.cap)
+            with self.condition:
+                if not ret:
+                    self.ended = stream_ended(self.cap)
+                    self.error = "End of stream" if self.ended else "Failed to grab frame"
+                    self.running = False
+                else:
+                    self.frame_count += 1
+                    self.buffer.append((self.frame_count, timestamp, frame))
+                self.condition.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Returns the freshest frame that has not been returned before.
+
+        Waits on a condition variable (no busy-waiting) until the capture
+        thread delivers a new frame. Frames captured since the previous call
+        but superseded by a newer one are counted as dropped.
+
+        Parameters:
+        - timeout: Maximum time to wait for a new frame (in seconds).
+
+        Returns:
+        - (sequence, timestamp, frame) of the newest buffered frame.
+        """
+        with self.condition:
+            self.condition.wait_for(self._has_new_frame, timeout)
+            if not (self.buffer and self.buffer[-1][0] > self.last_read_sequence):
+                raise self.failure()
+            sequence, timestamp, frame = self.buffer[-1]
+            self.dropped_frames += sequence - self.last_read_sequence - 1
+            self.last_read_sequence = sequence
+            return sequence, timestamp, frame
+
+    def failure(self):
+        """
+        Returns the exception for a read that got no frame: EndOfStream at the
+        end of a finite stream, otherwise the capture error or a timeout.
+        """
+        if self.ended:
+            return EndOfStream(self.error)
+        return Exception(self.error or "Timed out waiting for a frame")
+
+    def _has_new_frame(self):
+        return self.error is not None or (self.buffer and self.buffer[-1][0] > self.last_read_sequence)
+
+    def wait_for_sequence(self, sequence, timeout=1.0):
+        """
+        Blocks until a frame newer than the given sequence number is buffered.
+
+        Parameters:
+        - sequence: Sequence number the caller has already consumed.
+        - timeout: Maximum time to wait (in seconds).
+
+        Returns:
+        - True if a newer frame is available, False on timeout or capture error.
+        """
+        def newer():
+            return bool(self.buffer) and self.buffer[-1][0] > sequence
+
+        with self.condition:
+            self.condition.wait_for(lambda: self.error is not None or newer(), timeout)
+            return newer()
+
+    def snapshot(self):
+        """
+        Returns a copy of the buffered (sequence, timestamp, frame) entries, oldest first.
+        """
+        with self.condition:
+            return list(self.buffer)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
 
 class CameraFeed:
-    def __init__(self, width=1200, height=720):
-        self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-        
+    def __init__(self, width=1200, height=720, camera_index=0, threaded=False, buffer_size=2, capture=None):
+        """
+        Opens a camera and optionally starts a background capture thread.
+
+        Parameters:
+        - width: Requested frame width (in pixels).
+        - height: Requested frame height (in pixels).
+        - camera_index: Index of the capture device, or a path to a video file.
+        - threaded: If True, frames are grabbed on a background thread and
+          get_frame() returns the freshest one without blocking on the sensor.
+        - buffer_size: Ring buffer length used in threaded mode.
+        - capture: An already opened capture-like object (read/release/isOpened)
+          to use instead of opening camera_index, e.g. a FrameSource replaying
+          a recording. FrameSources also provide the capture timestamps.
+        """
+        if capture is not None:
+            self.cap = capture
+        elif isinstance(camera_index, str):
+            self.cap = cv2.VideoCapture(camera_index)
+        else:
+            self.cap = CameraSource(camera_index, width, height)
+
         if not self.cap.isOpened():
             raise Exception("Error: Could not open camera.")
-    
+
+        self.last_timestamp = None
+        self.last_sequence = 0
+        self.grabber = None
+        if threaded:
+            self.grabber = FrameGrabber(self.cap, buffer_size=buffer_size).start()
+
+    @property
+    def dropped_frames(self):
+        """
+        Number of captured frames that were superseded before being read.
+        """
+        return self.grabber.dropped_frames if self.grabber else 0
+
+    def now(self):
+        """
+        Returns the current time on the clock of last_timestamp.
+        """
+        return capture_clock(self.cap)()
+
     def get_frame(self):
-        ret, frame = self.cap.read()
+        if self.grabber is not None:
+            self.last_sequence, self.last_timestamp, frame = self.grabber.read()
+            return frame
+
+        ret, frame, timestamp = read_timestamped(self.cap)
         if not ret:
+            if stream_ended(self.cap):
+                raise EndOfStream("End of stream")
             raise Exception("Failed to grab frame")
+        self.last_timestamp = timestamp
+        self.last_sequence += 1
         return frame
-    
+
     def release(self):
+        if self.grabber is not None:
+            self.grabber.stop()
         self.cap.release()
-    
+
     def show_frame(self, frame, window_name='Camera Feed'):
         cv2.imshow(window_name, frame)
-    
+
     def exit_requested(self):
         return cv2.waitKey(1) & 0xFF == ord('q')
 
@@ -0,0 +1,115 @@
+import sys
+import cv2
+from camera_feed import CameraFeed, FrameGrabber
+
+
+class CameraGroup:
+    def __init__(self, feeds, tolerance=0.010, policy="reject", timeout=1.0):
+        """
+        Captures several cameras in parallel and returns timestamp-matched frame sets.
+
+        Every feed is grabbed on its own background thread, so one iteration
+        costs a single frame period instead of the sum of all blocking reads.
+
+        Parameters:
+        - feeds: List of CameraFeed objects (e.g. [left, right]). Feeds that were
+          not opened with threaded=True get a capture thread attached here.
+        - tolerance: Maximum allowed skew between the frames of a set (in seconds).
+        - policy: What to do with out-of-tolerance sets: "reject" drops the set,
+          "interpolate" blends the two frames bracketing the common timestamp.
+        - timeout: Maximum time to wait for new frames from every camera (in seconds).
+        """
+        if not feeds:
+            raise ValueError("CameraGroup needs at least one feed.")
+        if policy not in ("reject", "interpolate"):
+            raise ValueError("Policy must be 'reject' or 'interpolate'.")
+        self.feeds = feeds
+        self.tolerance = tolerance
+        self.policy = policy
+        self.timeout = timeout
+        for feed in self.feeds:
+            if feed.grabber is None:
+                feed.grabber = FrameGrabber(feed.cap, buffer_size=4).start()
+
+        self.last_sequences = [0] * len(feeds)
+        self.last_timestamps = None
+        self.last_skew = None
+        self.max_skew = 0.0
+        self.matched_sets = 0
+        self.rejected_sets = 0
+        self.interpolated_sets = 0
+
+    def get_frames(self):
+        """
+        Returns one frame per camera, matched to a common capture time.
+
+        The reference time is the newest timestamp every camera has reached;
+        from each ring buffer the frame closest to it is picked.
+
+        Returns:
+        - frames: List of frames in feed order, or None if the set was rejected.
+        """
+        for feed, sequence in zip(self.feeds, self.last_sequences):
+            if not feed.grabber.wait_for_sequence(sequence, self.timeout):
+                raise feed.grabber.failure()
+
+        snapshots = [feed.grabber.snapshot() for feed in self.feeds]
+        reference = min(entries[-1][1] for entries in snapshots)
+        picks = [min(entries, key=lambda entry: abs(entry[1] - reference)) for entries in snapshots]
+        self.last_sequences = [entries[-1][0] for entries in snapshots]
+
+        timestamps = [timestamp for _, timestamp, _ in picks]
+        frames = [frame for _, _, frame in picks]
+        self.last_skew = max(timestamps) - min(timestamps)
+
+        if self.last_skew > self.tolerance:
+            if self.policy == "reject":
+                self.rejected_sets += 1
+                return None
+            for i, entries in enumerate(snapshots):
+                interpolated = self._interpolate(entries, reference)
+                if interpolated is not None:
+                    frames[i] = interpolated
+                    timestamps[i] = reference
+            self.last_skew = max(timestamps) - min(timestamps)
+            if self.last_skew > self.tolerance:
+                self.rejected_sets += 1
+                return None
+            self.interpolated_sets += 1
+
+        self.max_skew = max(self.max_skew, self.last_skew)
+        self.last_timestamps = timestamps
+        self.matched_sets += 1
+        return frames
+
+    @staticmethod
+    def _interpolate(entries, reference):
+        """
+        Linearly blends the two buffered frames bracketing the reference time.
+
+        Returns:
+        - The blended frame, or None if the reference is not bracketed.
+        """
+        for (_, t0, frame0), (_, t1, frame1) in zip(entries, entries[1:]):
+            if t0 <= reference <= t1 and t1 > t0:
+                weight = (reference - t0) / (t1 - t0)
+                return cv2.addWeighted(frame0, 1.0 - weight, frame1, weight, 0.0)
+        return None
+
+    def release(self):
+        for feed in self.feeds:
+            feed.release()
+
+
+if __name__ == "__main__":
+    # Validate synchronization offline: python camera_group.py left.avi right.avi
+    group = CameraGroup([CameraFeed(camera_index=path, threaded=True, buffer_size=4) for path in sys.argv[1:]])
+    try:
+        while True:
+            group.get_frames()
+    except Exception as e:
+        print(f"Stopped: {e}")
+    finally:
+        group.release()
+    print(f"Matched sets: {group.matched_sets}, rejected: {group.rejected_sets}, "
+          f"interpolated: {group.interpolated_sets}, max skew: {group.max_skew * 1000:.2f} ms")
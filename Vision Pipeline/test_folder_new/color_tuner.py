@@ -0,0 +1,214 @@
+import threading
+import cv2
+import numpy as np
+
+# Histogram bins per HSV channel (OpenCV hue is 0-179)
+HISTOGRAM_BINS = (90, 32, 32)
+HISTOGRAM_RANGES = [0, 180, 0, 256, 0, 256]
+BIN_WIDTHS = (2, 8, 8)
+CHANNEL_MAXIMUMS = (179, 255, 255)
+
+
+class ColorTuner:
+    def __init__(self, detector, sample_interval=3, update_samples=5, decay=0.95, coverage=0.98,
+                 margin=(4, 16, 16), max_background=0.005, min_pixels=2000, threaded=True):
+        """
+        Keeps the HSV range of a BallDetector tuned to the current lighting.
+
+        Every sample_interval-th confirmed detection, observe() copies the
+        bounding box and a ring of background around it for a worker thread;
+        that copy is all the tracking loop pays. The worker keeps decaying HSV
+        histograms of the ball (the inner part of the box) and of the ring,
+        and every update_samples samples derives a new range from them: the
+        hue band and the saturation and value floors that hold `coverage` of
+        the ball pixels, widened by `margin`. Saturation and value have no
+        upper limit.
+
+        The range the detector was configured with is the narrowest one ever
+        published: the tuner only widens it, where the lighting calls for it,
+        and takes it back to the configured range when the light returns.
+        (A range fitted tightly to the current ball would lose it as soon as
+        the light changes faster than the updates, and without detections
+        there are no samples to recover from.) A range that would accept more
+        than max_background of the ring pixels on top of what the configured
+        range accepts is not published, so the range cannot drift onto the
+        surroundings of the ball.
+
+        Ranges are published through BallDetector.set_color_range, which
+        swaps them in atomically (and rebuilds the lookup table of the "lut"
+        engine here, off the tracking loop).
+
+        Parameters:
+        - detector: The BallDetector to tune.
+        - sample_interval: Number of confirmed detections per sample.
+        - update_samples: Number of samples between range updates.
+        - decay: Weight the histograms keep per sample; older lighting fades out.
+        - coverage: Fraction of the ball pixels the range must accept.
+        - margin: (hue, saturation, value) widening of the range beyond that.
+        - max_background: Largest fraction of the ring pixels a published
+          range may accept beyond the configured range.
+        - min_pixels: Ball pixels (decayed) needed before the first update.
+        - threaded: If False, samples are processed inside observe() (for
+          reproducible offline runs).
+        """
+        if not 0 < coverage < 1:
+            raise ValueError("Coverage must be in (0, 1).")
+        if not 0 < decay <= 1:
+            raise ValueError("Decay must be in (0, 1].")
+        self.detector = detector
+        self.sample_interval = sample_interval
+        self.update_samples = update_samples
+        self.decay = decay
+        self.coverage = coverage
+        self.margin = np.array(margin)
+        self.max_background = max_background
+        self.min_pixels = min_pixels
+        self.threaded = threaded
+        self.base_range = detector.color_range
+        self.ball_histogram = np.zeros(HISTOGRAM_BINS, np.float32)
+        self.background_histogram = np.zeros(HISTOGRAM_BINS, np.float32)
+        self.detections = 0
+        self.samples = 0
+        self.published = 0
+        self.rejected = 0
+        self.pending = None
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.threaded or self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="ColorTuner", daemon=True)
+        self.thread.start()
+        return self
+
+    def observe(self, frame, bounding_box):
+        """
+        Offers a confirmed detection. Call it for detections the tracker
+        accepted; it returns at once on all but every sample_interval-th call.
+
+        Parameters:
+        - frame: The BGR frame of the detection.
+        - bounding_box: The (x, y, w, h) box of the ball.
+        """
+        self.detections += 1
+        if self.detections % self.sample_interval:
+            return
+        x, y, w, h = bounding_box
+        ring = max(w, h) // 2
+        frame_height, frame_width = frame.shape[:2]
+        x0, y0 = max(0, x - ring), max(0, y - ring)
+        x1, y1 = min(frame_width, x + w + ring), min(frame_height, y + h + ring)
+        sample = (frame[y0:y1, x0:x1].copy(), (x - x0, y - y0, w, h))
+        if not self.threaded:
+            self._process(*sample)
+            return
+        with self.condition:
+            self.pending = sample  # The worker only needs the latest sample
+            self.condition.notify()
+
+    def _run(self):
+        while self.running:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait(timeout=0.5)
+                sample, self.pending = self.pending, None
+            if sample is not None:
+                self._process(*sample)
+
+    def _process(self, patch, box):
+        x, y, w, h = box
+        center = (x + w // 2, y + h // 2)
+        # Inner part of the box is ball; outside a larger ellipse (clear of the ball edge) is background
+        ball_mask = np.zeros(patch.shape[:2], np.uint8)
+        cv2.ellipse(ball_mask, center, (int(w * 0.35), int(h * 0.35)), 0, 0, 360, 255, -1)
+        background_mask = np.full(patch.shape[:2], 255, np.uint8)
+        cv2.ellipse(background_mask, center, (int(w * 0.75), int(h * 0.75)), 0, 0, 360, 0, -1)
+
+        hsv = cv2.cvtColor(patch, cv2.COLOR_BGR2HSV)
+        for histogram, mask in ((self.ball_histogram, ball_mask), (self.background_histogram, background_mask)):
+            histogram *= self.decay
+            histogram += cv2.calcHist([hsv], [0, 1, 2], mask, list(HISTOGRAM_BINS), HISTOGRAM_RANGES)
+
+        self.samples += 1
+        if self.samples % self.update_samples == 0:
+            self.update()
+
+    def estimate_range(self):
+        """
+        Derives a color range from the ball histogram.
+
+        Returns:
+        - (lower, upper, background_fraction), or None before min_pixels ball
+          pixels have been seen. The range contains the configured one, and
+          background_fraction is the share of the ring pixels it accepts
+          beyond the configured range.
+        """
+        total = float(self.ball_histogram.sum())
+        if total < self.min_pixels:
+            return None
+        tail = 1.0 - self.coverage
+        lower_bins, upper_bins = [], []
+        for axis in range(3):
+            marginal = self.ball_histogram.sum(axis=tuple(a for a in range(3) if a != axis))
+            cdf = np.cumsum(marginal) / total
+            if axis == 0:  # Hue band, trimmed on both sides
+                lower_bins.append(int(np.searchsorted(cdf, tail / 2)))
+                upper_bins.append(int(np.searchsorted(cdf, 1.0 - tail / 2)))
+            else:  # Saturation and value floors
+                lower_bins.append(int(np.searchsorted(cdf, tail)))
+                upper_bins.append(HISTOGRAM_BINS[axis] - 1)
+        widths = np.array(BIN_WIDTHS)
+        lower = np.maximum(np.array(lower_bins) * widths - self.margin, 0)
+        upper = np.minimum((np.array(upper_bins) + 1) * widths - 1 + self.margin, CHANNEL_MAXIMUMS)
+        upper[1:] = CHANNEL_MAXIMUMS[1:]
+        lower = np.minimum(lower, self.base_range[0])
+        upper = np.maximum(upper, self.base_range[1])
+
+        background_total = float(self.background_histogram.sum())
+        if not background_total:
+            return lower, upper, 0.0
+        added = self._accepted_background(lower, upper) - self._accepted_background(*self.base_range)
+        return lower, upper, added / background_total
+
+    def _accepted_background(self, lower, upper):
+        # Every bin the range touches counts, which overestimates slightly
+        first, last = np.asarray(lower) // BIN_WIDTHS, np.asarray(upper) // BIN_WIDTHS
+        return float(self.background_histogram[first[0]:last[0] + 1, first[1]:last[1] + 1,
+                                               first[2]:last[2] + 1].sum())
+
+    def update(self):
+        """
+        Publishes a new range to the detector if the histograms give a safe one.
+        Called by the worker every update_samples samples.
+        """
+        estimate = self.estimate_range()
+        if estimate is None:
+            return
+        lower, upper, background_fraction = estimate
+        if background_fraction > self.max_background:
+            self.rejected += 1
+            return
+        current_lower, current_upper = self.detector.color_range
+        if np.array_equal(lower, current_lower) and np.array_equal(upper, current_upper):
+            return
+        self.detector.set_color_range(lower, upper)
+        self.published += 1
+
+    def stats(self):
+        """
+        Returns the sample and update counts and the current detector range.
+        """
+        lower, upper = self.detector.color_range
+        return {"samples": self.samples, "published": self.published, "rejected": self.rejected,
+                "lower": [int(v) for v in lower], "upper": [int(v) for v in upper]}
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
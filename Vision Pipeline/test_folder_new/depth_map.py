@@ -1,70 +1,322 @@
+import time
+from collections import deque
 import cv2
 import numpy as np
+from depth_source import DepthSource
+from tiled_stereo import TiledStereoMatcher, create_matcher
 
-class DepthMap:
-    def __init__(self, baseline=0.1, focal_length=700):
+class DepthMap(DepthSource):
+    def __init__(self, baseline=0.1, focal_length=700, num_disparities=16 * 5, block_size=15, scale=1.0,
+                 calibration=None, engine="bm", workers=None, incremental=False, tile_size=64,
+                 change_threshold=25, min_changed_fraction=0.01, refresh_interval=30):
         """
         Initializes the depth map module.
-        
+
+        The block matcher and all intermediate images are created once and
+        reused for every frame. Disparity is converted to depth through a
+        lookup table, since StereoBM only produces a few thousand distinct
+        fixed-point disparity values.
+
         Parameters:
         - baseline: Distance between the stereo cameras (in meters).
         - focal_length: Focal length of the cameras (in pixels).
+        - num_disparities: Disparity search range at full resolution (multiple of 16).
+        - block_size: Matching block size at full resolution (odd).
+        - scale: Resolution factor at which matching runs, e.g. 0.5 for half
+          resolution. The depth map is returned at this resolution.
+        - calibration: Optional StereoCalibration. Frames are then rectified
+          before matching, and its baseline and focal length replace the
+          values above.
+        - engine: "bm" (StereoBM), "sgbm" (StereoSGBM, smoother and denser
+          but several times slower) or "tiled_sgbm" (StereoSGBM on horizontal
+          strips matched in parallel worker processes, see TiledStereoMatcher).
+        - workers: Number of worker processes of the tiled engine; defaults
+          to the CPU count.
+        - incremental: Keep the disparity map of full frames between calls and
+          only recompute the tiles whose pixels changed since the previous
+          frame (see incremental_stats). The static background is then
+          matched once per refresh instead of every frame.
+        - tile_size: Tile edge at matching resolution (in pixels).
+        - change_threshold: Gray level difference that counts a pixel as changed.
+        - min_changed_fraction: Fraction of changed pixels (in the left or
+          right image) that marks a tile for recomputation; single noisy
+          pixels do not.
+        - refresh_interval: Number of frames after which the whole map is
+          recomputed, which also catches slow changes such as lighting.
         """
+        if not 0 < scale <= 1:
+            raise ValueError("Scale must be in (0, 1].")
+        self.calibration = calibration
+        if calibration is not None:
+            baseline = calibration.baseline
+            focal_length = calibration.focal_length
         self.baseline = baseline
         self.focal_length = focal_length
+        self.scale = scale
+
+        # Search range and block size shrink with the image
+        self.num_disparities = max(16, int(round(num_disparities * scale / 16)) * 16)
+        self.block_size = max(5, int(block_size * scale) | 1)
+        if engine == "tiled_sgbm":
+            self.stereo = TiledStereoMatcher("sgbm", self.num_disparities, self.block_size, workers)
+        elif engine in ("bm", "sgbm"):
+            self.stereo = create_matcher(engine, self.num_disparities, self.block_size)
+        else:
+            raise ValueError("Engine must be 'bm', 'sgbm' or 'tiled_sgbm'.")
+        self.engine = engine
+
+        # Fixed-point disparities (x16) of both matchers range from (minDisparity - 1) * 16 to num_disparities * 16
+        self.min_raw_disparity = -16
+        raw = np.arange(self.min_raw_disparity, self.num_disparities * 16 + 1, dtype=np.float32)
+        disparity = raw / 16.0 / scale  # In full-resolution pixels
+        # Avoid division by zero
+        disparity[disparity <= 0] = 0.1
+        self.depth_table = ((self.focal_length * self.baseline) / disparity).astype(np.float32)
+
+        self._buffers = {}
+        self.last_origin = (0, 0)
+
+        self.incremental = incremental
+        self.tile_size = tile_size
+        self.change_threshold = change_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.refresh_interval = refresh_interval
+        self.change_kernel = np.ones((self.block_size, self.block_size), np.uint8)
+        self.cache_shape = None  # Shape of the cached disparity map, None until the first full frame
+        self.frames_since_refresh = 0
+        self.tiles_recomputed = 0  # Tiles recomputed for the last frame
+        self.tile_count = 0
+        self.full_time = None  # Duration of the last full recomputation (in seconds)
+        self.update_times = deque(maxlen=100)  # Durations of the recent partial updates
+        self.recomputed_counts = deque(maxlen=100)
+
+    def _buffer(self, name, shape, dtype):
+        # Buffers are reallocated only when the frame or region size changes
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype)
+        return buffer
+
+    def _compute_disparity(self, left_frame, right_frame, roi=None):
+        """
+        Runs block matching on the full frames or on the band covering roi.
+
+        Returns:
+        - disparity: Fixed-point (x16) disparities at `scale` resolution.
+        - origin: Full-resolution (x, y) of the first disparity pixel.
+        """
+        origin_x, origin_y = 0, 0
+        if roi is not None:
+            x, y, w, h = roi
+            frame_height, frame_width = left_frame.shape[:2]
+            # The matcher needs num_disparities columns to the left of the region
+            search = int(np.ceil(self.num_disparities / self.scale)) + self.block_size
+            x0, x1 = max(0, x - search), min(frame_width, x + w)
+            y0, y1 = max(0, y), min(frame_height, y + h)
+            origin_x, origin_y = x0, y0
+
+        if self.calibration is not None:
+            # Only the remap tables of the region are evaluated
+            region = (origin_x, origin_y, x1 - x0, y1 - y0) if roi is not None else None
+            left_frame, right_frame = self.calibration.rectify(left_frame, right_frame, region)
+        elif roi is not None:
+            left_frame, right_frame = left_frame[y0:y1, x0:x1], right_frame[y0:y1, x0:x1]
+
+        # Convert frames to grayscale
+        shape = left_frame.shape[:2]
+        gray_left = cv2.cvtColor(left_frame, cv2.COLOR_BGR2GRAY, dst=self._buffer("gray_left", shape, np.uint8))
+        gray_right = cv2.cvtColor(right_frame, cv2.COLOR_BGR2GRAY, dst=self._buffer("gray_right", shape, np.uint8))
+        if self.scale != 1:
+            shape = (max(1, int(shape[0] * self.scale)), max(1, int(shape[1] * self.scale)))
+            size = (shape[1], shape[0])
+            gray_left = cv2.resize(gray_left, size, dst=self._buffer("small_left", shape, np.uint8),
+                                   interpolation=cv2.INTER_AREA)
+            gray_right = cv2.resize(gray_right, size, dst=self._buffer("small_right", shape, np.uint8),
+                                    interpolation=cv2.INTER_AREA)
+
+        # Compute fixed-point disparity map
+        if self.incremental and roi is None:
+            disparity = self._update_disparity(gray_left, gray_right)
+        else:
+            disparity = self._buffer("disparity", shape, np.int16)
+            self.stereo.compute(gray_left, gray_right, disparity=disparity)
+
+        if roi is not None:
+            # Drop the extra search columns on the left of the region
+            skip = int((roi[0] - origin_x) * self.scale)
+            disparity = disparity[:, skip:]
+            origin_x += skip / self.scale
+        return disparity, (origin_x, origin_y)
+
+    def _changed_tiles(self, image, previous, grid):
+        # Fraction of changed pixels per tile, from the area average of the change mask
+        difference = cv2.absdiff(image, previous, dst=self._buffer("difference", image.shape, np.uint8))
+        cv2.threshold(difference, self.change_threshold, 255, cv2.THRESH_BINARY, dst=difference)
+        # Disparities up to half a block away see the change through their matching window
+        cv2.dilate(difference, self.change_kernel, dst=difference)
+        fractions = cv2.resize(difference, (grid[1], grid[0]), interpolation=cv2.INTER_AREA)
+        return fractions > 255 * self.min_changed_fraction
+
+    def _update_disparity(self, gray_left, gray_right):
+        """
+        Brings the cached full-frame disparity map up to date with a new pair.
+
+        Returns:
+        - disparity: The cached map, reused by the next call.
+        """
+        start = time.perf_counter()
+        shape = gray_left.shape
+        grid = (-(-shape[0] // self.tile_size), -(-shape[1] // self.tile_size))
+        disparity = self._buffer("cached_disparity", shape, np.int16)
+        previous_left = self._buffer("previous_left", shape, np.uint8)
+        previous_right = self._buffer("previous_right", shape, np.uint8)
+        self.tile_count = grid[0] * grid[1]
+
+        if self.cache_shape != shape or self.frames_since_refresh >= self.refresh_interval:
+            self.stereo.compute(gray_left, gray_right, disparity=disparity)
+            self.cache_shape = shape
+            self.frames_since_refresh = 0
+            self.tiles_recomputed = self.tile_count
+            self.full_time = time.perf_counter() - start
+        else:
+            changed = self._changed_tiles(gray_left, previous_left, grid)
+            # A change in the right image moves matches up to num_disparities columns to its right
+            changed_right = self._changed_tiles(gray_right, previous_right, grid)
+            for shift in range(-(-self.num_disparities // self.tile_size) + 1):
+                changed[:, shift:] |= changed_right[:, :grid[1] - shift]
+            self._recompute_tiles(gray_left, gray_right, disparity, changed)
+            self.frames_since_refresh += 1
+            self.tiles_recomputed = int(np.count_nonzero(changed))
+            self.update_times.append(time.perf_counter() - start)
+            self.recomputed_counts.append(self.tiles_recomputed)
+
+        np.copyto(previous_left, gray_left)
+        np.copyto(previous_right, gray_right)
+        return disparity
+
+    def _recompute_tiles(self, gray_left, gray_right, disparity, changed):
+        # Each run of changed tiles in a tile row is matched as one region,
+        # padded by the block size and the disparity search on the left
+        height, width = gray_left.shape
+        pad = self.block_size
+        for row in range(changed.shape[0]):
+            columns = np.flatnonzero(changed[row])
+            if columns.size == 0:
+                continue
+            breaks = np.flatnonzero(np.diff(columns) > 1)
+            for first, last in zip(np.r_[columns[0], columns[breaks + 1]], np.r_[columns[breaks], columns[-1]]):
+                y0, y1 = row * self.tile_size, min(height, (row + 1) * self.tile_size)
+                x0, x1 = first * self.tile_size, min(width, (last + 1) * self.tile_size)
+                top, bottom = max(0, y0 - pad), min(height, y1 + pad)
+                left, right = max(0, x0 - self.num_disparities - pad), min(width, x1 + pad)
+                region = self.stereo.compute(gray_left[top:bottom, left:right], gray_right[top:bottom, left:right])
+                disparity[y0:y1, x0:x1] = region[y0 - top:y1 - top, x0 - left:x1 - left]
+
+    def incremental_stats(self):
+        """
+        Returns the work saved by the incremental mode, or None before the first partial update.
 
-    def compute_depth_map(self, left_frame, right_frame):
+        Returns:
+        - Dict with the tiles recomputed for the last frame, the mean fraction
+          of tiles recomputed, the mean partial update and full recomputation
+          times (in milliseconds), and the speedup of a partial update over a
+          full recomputation.
+        """
+        if not self.update_times or self.full_time is None:
+            return None
+        update_time = float(np.mean(self.update_times))
+        return {
+            "tiles_recomputed": self.tiles_recomputed,
+            "tile_count": self.tile_count,
+            "recomputed_fraction": float(np.mean(self.recomputed_counts)) / self.tile_count,
+            "update_ms": update_time * 1000,
+            "full_ms": self.full_time * 1000,
+            "speedup": self.full_time / update_time,
+        }
+
+    def compute_depth_map(self, left_frame, right_frame, roi=None):
         """
         Computes the depth map from stereo images.
 
         Parameters:
         - left_frame: Frame from the left camera.
         - right_frame: Frame from the right camera.
+        - roi: Optional (x, y, w, h) region in full-resolution pixels. Only this
+          region is matched (plus the columns its disparity search needs).
 
         Returns:
-        - depth_map: The computed depth map.
+        - depth_map: The computed depth map at `scale` resolution, covering `roi`
+          if given. The array is reused by the next call.
         """
-        # Convert frames to grayscale
-        gray_left = cv2.cvtColor(left_frame, cv2.COLOR_BGR2GRAY)
-        gray_right = cv2.cvtColor(right_frame, cv2.COLOR_BGR2GRAY)
+        disparity, self.last_origin = self._compute_disparity(left_frame, right_frame, roi)
+
+        # Look up the depth of every fixed-point disparity value
+        index = self._buffer("index", disparity.shape, np.intp)
+        depth_map = self._buffer("depth", disparity.shape, np.float32)
+        np.subtract(disparity, self.min_raw_disparity, out=index)
+        np.take(self.depth_table, index, out=depth_map)
+        return depth_map
 
-        # Create stereo block matching object
-        stereo = cv2.StereoBM_create(numDisparities=16 * 5, blockSize=15)
+    def estimate_depth_in_box(self, left_frame, right_frame, bounding_box, agreement=0.1):
+        """
+        Estimates the distance of an object without computing a dense depth map.
 
-        # Compute disparity map
-        disparity = stereo.compute(gray_left, gray_right).astype(np.float32) / 16.0
+        Block matching runs only on the epipolar band of the bounding box, and
+        the depth is taken from the median of the valid disparities inside it.
 
-        # Avoid division by zero
-        disparity[disparity <= 0] = 0.1
+        Parameters:
+        - left_frame: Frame from the left camera.
+        - right_frame: Frame from the right camera.
+        - bounding_box: The (x, y, w, h) box of the object in the left frame.
+        - agreement: Relative deviation from the median within which a
+          disparity counts as consistent.
 
-        # Compute depth map
-        depth_map = (self.focal_length * self.baseline) / disparity
+        Returns:
+        - distance: Robust distance to the object (in meters), or None.
+        - confidence: Fraction of box pixels with a valid disparity that agrees
+          with the median, in [0, 1].
+        """
+        x, y, w, h = bounding_box[:4]
+        pad = self.block_size // 2 + 1  # Rows needed for full matching blocks at the box edges
+        band = (x, y - pad, w, h + 2 * pad)
+        disparity, origin = self._compute_disparity(left_frame, right_frame, band)
 
-        return depth_map
+        row0 = int((y - origin[1]) * self.scale)
+        col0 = int((x - origin[0]) * self.scale)
+        box = disparity[max(0, row0):max(0, row0) + max(1, int(h * self.scale)),
+                        max(0, col0):max(0, col0) + max(1, int(w * self.scale))]
+        valid = box[box > 0]
+        if valid.size == 0:
+            return None, 0.0
+
+        median = float(np.median(valid))
+        consistent = np.count_nonzero(np.abs(valid - median) <= agreement * median)
+        confidence = float(consistent) / box.size
+        distance = (self.focal_length * self.baseline) / (median / 16.0 / self.scale)
+        return distance, confidence
 
     def estimate_distance(self, depth_map, center):
         """
         Estimates the distance of the object center from the camera.
 
         Parameters:
-        - depth_map: The depth map.
-        - center: The (x, y) coordinates of the object center.
+        - depth_map: The depth map returned by the last compute_depth_map call.
+        - center: The (x, y) coordinates of the object center in the full frame.
 
         Returns:
-        - distance: Estimated distance from the object to the camera (in meters).
+        - distance: Estimated distance from the object to the camera (in meters),
+          or None if the center lies outside the depth map.
         """
-        x, y = center
+        x = int((center[0] - self.last_origin[0]) * self.scale)
+        y = int((center[1] - self.last_origin[1]) * self.scale)
+        if not (0 <= x < depth_map.shape[1] and 0 <= y < depth_map.shape[0]):
+            return None
         distance = depth_map[y, x]
         return distance
 
-    def visualize_depth_map(self, depth_map, window_name="Depth Map"):
+    def close(self):
         """
-        Displays the depth map.
-
-        Parameters:
-        - depth_map: The depth map to display.
-        - window_name: The name of the display window.
+        Stops the worker processes of the tiled engine.
         """
-        normalized_depth = cv2.normalize(depth_map, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-        colored_depth = cv2.applyColorMap(normalized_depth, cv2.COLORMAP_JET)
-        cv2.imshow(window_name, colored_depth)
+        if self.engine == "tiled_sgbm":
+            self.stereo.close()
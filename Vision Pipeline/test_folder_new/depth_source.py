@@ -0,0 +1,182 @@
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+
+
+class DepthSource(ABC):
+    """
+    Interface shared by the depth estimators (DepthMap for stereo pairs,
+    OrbbecDepthSource for RGB-D sensors), so the tracking loop can use either.
+
+    Each method takes the pair of frames the estimator works on: the left
+    and right camera images for stereo, or the color image and its
+    registered raw depth image for RGB-D.
+    """
+
+    @abstractmethod
+    def compute_depth_map(self, first_frame, second_frame, roi=None):
+        """
+        Returns a float32 depth map in meters, covering roi (x, y, w, h) if given.
+        """
+
+    @abstractmethod
+    def estimate_depth_in_box(self, first_frame, second_frame, bounding_box):
+        """
+        Returns (distance in meters or None, confidence in [0, 1]) for a bounding box.
+        """
+
+    @abstractmethod
+    def estimate_distance(self, depth_map, center):
+        """
+        Returns the depth at a full-frame (x, y) position of the last depth map, or None.
+        """
+
+    def close(self):
+        """
+        Releases the resources of the estimator.
+        """
+
+    def colorize_depth_map(self, depth_map):
+        """
+        Converts the depth map into a color image for display.
+
+        Parameters:
+        - depth_map: The depth map to convert.
+
+        Returns:
+        - colored_depth: A new BGR image, safe to hand to another thread.
+        """
+        normalized_depth = cv2.normalize(depth_map, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        return cv2.applyColorMap(normalized_depth, cv2.COLORMAP_JET)
+
+    def visualize_depth_map(self, depth_map, window_name="Depth Map"):
+        """
+        Displays the depth map.
+
+        Parameters:
+        - depth_map: The depth map to display.
+        - window_name: The name of the display window.
+        """
+        cv2.imshow(window_name, self.colorize_depth_map(depth_map))
+
+
+class OrbbecDepthSource(DepthSource):
+    def __init__(self, min_depth=0.01, max_depth=3.0, depth_unit=1e-4):
+        """
+        Depth from the registered depth stream of an Orbbec Astra, replacing
+        stereo matching on RGB-D hardware.
+
+        The raw uint16 image is used as delivered by OrbbecSource (or a
+        replayed recording): no float conversion of the full frame. The valid
+        depth range is converted to raw units once, so masking is a single
+        integer cv2.inRange, and only the pixels of a bounding box are read
+        for the ball distance.
+
+        Parameters:
+        - min_depth, max_depth: Valid depth range (in meters); the notebook
+          used 10 mm to 3 m. Raw value 0 (no reading) is always invalid.
+        - depth_unit: Meters per raw depth unit (100 micrometers for ONI_PIXEL_FORMAT_DEPTH_100_UM).
+        """
+        if not 0 < min_depth < max_depth:
+            raise ValueError("Depth range must satisfy 0 < min_depth < max_depth.")
+        self.depth_unit = depth_unit
+        self.min_raw = max(1, int(np.ceil(min_depth / depth_unit)))
+        self.max_raw = min(65535, int(max_depth / depth_unit))
+        self.scale = 1.0  # Depth maps are at full resolution, as for DepthMap(scale=1)
+        self.last_origin = (0, 0)
+        self._buffers = {}
+
+    def _buffer(self, name, shape, dtype):
+        # Buffers are reallocated only when the frame or region size changes
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype)
+        return buffer
+
+    def valid_mask(self, raw_depth):
+        """
+        Returns a uint8 mask (255 = valid) of the pixels inside the depth range.
+        """
+        mask = self._buffer("mask", raw_depth.shape, np.uint8)
+        return cv2.inRange(raw_depth, self.min_raw, self.max_raw, dst=mask)
+
+    def compute_depth_map(self, color_frame, raw_depth, roi=None):
+        """
+        Converts the raw depth image to meters.
+
+        Parameters:
+        - color_frame: The color frame (unused; depth is already registered to it).
+        - raw_depth: The uint16 depth image in units of depth_unit.
+        - roi: Optional (x, y, w, h) region to convert.
+
+        Returns:
+        - depth_map: float32 depth (in meters), 0 outside the valid range. The
+          array is reused by the next call.
+        """
+        self.last_origin = (0, 0)
+        if roi is not None:
+            x, y, w, h = roi
+            x, y = max(0, x), max(0, y)
+            raw_depth = raw_depth[y:y + h, x:x + w]
+            self.last_origin = (x, y)
+        masked = self._buffer("masked", raw_depth.shape, np.uint16)
+        # Pixels outside the mask are left untouched, so the reused buffer is cleared first
+        masked.fill(0)
+        cv2.bitwise_and(raw_depth, raw_depth, dst=masked, mask=self.valid_mask(raw_depth))
+        depth_map = self._buffer("depth", raw_depth.shape, np.float32)
+        np.multiply(masked, np.float32(self.depth_unit), out=depth_map, casting="unsafe")
+        return depth_map
+
+    def estimate_depth_in_box(self, color_frame, raw_depth, bounding_box, agreement=0.1):
+        """
+        Estimates the distance of an object from the depth pixels inside its box.
+
+        Parameters:
+        - color_frame: The color frame (unused; depth is already registered to it).
+        - raw_depth: The uint16 depth image in units of depth_unit.
+        - bounding_box: The (x, y, w, h) box of the object.
+        - agreement: Relative deviation from the median within which a depth
+          counts as consistent.
+
+        Returns:
+        - distance: Median depth of the valid box pixels (in meters), or None.
+        - confidence: Fraction of box pixels with a valid depth that agrees
+          with the median, in [0, 1].
+        """
+        x, y, w, h = bounding_box[:4]
+        box = raw_depth[max(0, y):max(0, y + h), max(0, x):max(0, x + w)]
+        if box.size == 0:
+            return None, 0.0
+        valid = box[(box >= self.min_raw) & (box <= self.max_raw)]
+        if valid.size == 0:
+            return None, 0.0
+        median = int(np.median(valid))
+        tolerance = int(agreement * median)
+        consistent = np.count_nonzero((valid >= median - tolerance) & (valid <= median + tolerance))
+        return median * self.depth_unit, float(consistent) / box.size
+
+    def estimate_distance(self, depth_map, center):
+        """
+        Returns the depth (in meters) at a full-frame (x, y) position of the
+        last depth map, or None outside it or where the depth is invalid.
+        """
+        x = int(center[0] - self.last_origin[0])
+        y = int(center[1] - self.last_origin[1])
+        if not (0 <= x < depth_map.shape[1] and 0 <= y < depth_map.shape[0]) or depth_map[y, x] == 0:
+            return None
+        return float(depth_map[y, x])
+
+
+if __name__ == "__main__":
+    # Buffer reuse check: invalid pixels of a frame read as 0, whatever the previous frame held
+    depth_source = OrbbecDepthSource()
+    depth_source.compute_depth_map(None, np.full((4, 6), 5000, np.uint16))
+    raw_depth = np.full((4, 6), 5000, np.uint16)
+    raw_depth[0] = 0  # No reading
+    raw_depth[1] = 60000  # Beyond max_depth
+    depth_map = depth_source.compute_depth_map(None, raw_depth)
+    assert not depth_map[:2].any(), "Invalid pixels kept the previous frame's depth"
+    assert np.allclose(depth_map[2:], 0.5), "Valid pixels were not converted to meters"
+    assert depth_source.estimate_distance(depth_map, (3, 0)) is None, "Distance returned for a pixel without depth"
+    assert depth_source.estimate_distance(depth_map, (3, 1)) is None, "Distance returned beyond max_depth"
+    print("Depth buffer reuse check passed")
@@ -0,0 +1,79 @@
+import threading
+import time
+import cv2
+
+
+class Display:
+    def __init__(self, rate=15.0, headless=False):
+        """
+        Shows annotated frames on a background thread at a capped rate.
+
+        The tracking loop only hands over its latest results; cv2.imshow and
+        cv2.waitKey run here, so they never stall the camera-rate loop. Frames
+        published faster than `rate` simply replace each other.
+
+        Parameters:
+        - rate: Maximum number of window refreshes per second.
+        - headless: If True, no window is opened and nothing is rendered.
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive.")
+        self.period = 1.0 / rate
+        self.headless = headless
+        self.latest = {}  # Window name -> latest image
+        self.condition = threading.Condition()
+        self.next_render_time = 0.0
+        self.quit = False
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.headless or self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="Display", daemon=True)
+        self.thread.start()
+        return self
+
+    def wants_frame(self):
+        """
+        Returns True if the next render is due, so callers can skip annotating
+        (and copying) frames that would never be shown.
+        """
+        return not self.headless and time.perf_counter() >= self.next_render_time
+
+    def publish(self, window_name, image):
+        """
+        Hands over the latest image for a window. The image must not be
+        modified by the caller afterwards.
+        """
+        if self.headless:
+            return
+        with self.condition:
+            self.latest[window_name] = image
+            self.condition.notify()
+
+    def _run(self):
+        while self.running:
+            with self.condition:
+                while self.running and not self.latest:
+                    self.condition.wait(timeout=self.period)
+                images, self.latest = self.latest, {}
+            self.next_render_time = time.perf_counter() + self.period
+            for window_name, image in images.items():
+                cv2.imshow(window_name, image)
+            # waitKey also pumps the GUI events, so it stays on this thread
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.quit = True
+            time.sleep(max(0.0, self.next_render_time - time.perf_counter()))
+        cv2.destroyAllWindows()
+
+    def exit_requested(self):
+        return self.quit
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
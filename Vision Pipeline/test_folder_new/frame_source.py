@@ -0,0 +1,369 @@
+import json
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+
+try:
+    from primesense import openni2
+    from primesense import _openni2 as c_api
+except ImportError:  # Only needed for the Orbbec camera
+    openni2 = None
+    c_api = None
+
+
+class EndOfStream(EOFError):
+    """
+    Raised by CameraFeed when a finite source (a replayed recording or a
+    synthetic scene) has delivered its last frame.
+    """
+
+
+class FrameSource(ABC):
+    """
+    Interface of everything CameraFeed can read from.
+
+    It follows cv2.VideoCapture (read/isOpened/release), so a FrameSource and
+    a plain VideoCapture are interchangeable, and adds read_timestamped() so
+    a source can report when its frame was actually captured. Frames captured
+    together with the main frame (e.g. the Orbbec depth image) are exposed in
+    `paired_frames` until the next read. A finite source sets `ended` once
+    it has no more frames; read_timestamped() then fails like a VideoCapture
+    at the end of a file, and CameraFeed raises EndOfStream.
+    """
+
+    def __init__(self):
+        self.paired_frames = {}
+        self.ended = False
+
+    @abstractmethod
+    def read_timestamped(self):
+        """
+        Returns:
+        - (ret, frame, timestamp) with a perf_counter() capture time.
+        """
+
+    def read(self):
+        ret, frame, _ = self.read_timestamped()
+        return ret, frame
+
+    def now(self):
+        """
+        Returns the current time on the clock of the capture timestamps.
+        """
+        return time.perf_counter()
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+def read_timestamped(capture):
+    """
+    Reads a frame and its capture time from a FrameSource or a cv2.VideoCapture.
+    """
+    if isinstance(capture, FrameSource):
+        return capture.read_timestamped()
+    ret, frame = capture.read()
+    return ret, frame, time.perf_counter()
+
+
+def stream_ended(capture):
+    """
+    Returns True if a failed read of a FrameSource or cv2.VideoCapture was the end of its stream.
+    """
+    return isinstance(capture, FrameSource) and capture.ended
+
+
+def capture_clock(capture):
+    """
+    Returns the function giving the current time on the timestamp clock of a
+    FrameSource or a cv2.VideoCapture.
+    """
+    return capture.now if isinstance(capture, FrameSource) else time.perf_counter
+
+
+class CameraSource(FrameSource):
+    def __init__(self, camera_index=0, width=1200, height=720):
+        """
+        A live camera. DirectShow is only used on Windows, so the same code
+        runs on the Linux machines.
+        """
+        super().__init__()
+        backend = cv2.CAP_DSHOW if sys.platform == "win32" else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(camera_index, backend)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def read_timestamped(self):
+        ret, frame = self.cap.read()
+        return ret, frame, time.perf_counter()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class OrbbecSource(FrameSource):
+    def __init__(self, width=640, height=480, fps=30, redist_path="../lib/Redist/"):
+        """
+        Color stream of an Orbbec Astra through OpenNI2, with the registered
+        depth image of the same instant in paired_frames["depth"]. The depth
+        image is only valid until the next read, so read it synchronously
+        (CameraFeed with threaded=False).
+
+        Parameters:
+        - width, height, fps: Stream mode, (640, 480, 30) or (320, 240, 60).
+        - redist_path: Folder of the OpenNI2 redistributable libraries.
+        """
+        super().__init__()
+        if openni2 is None:
+            raise Exception("The primesense package is required for the Orbbec camera.")
+        self.width = width
+        self.height = height
+        self.depth_frame = None
+        openni2.initialize(redist_path)
+        self.device = openni2.Device.open_any()
+
+        self.depth_stream = self.device.create_depth_stream()
+        self.depth_stream.start()
+        self.depth_stream.set_video_mode(c_api.OniVideoMode(
+            pixelFormat=c_api.OniPixelFormat.ONI_PIXEL_FORMAT_DEPTH_100_UM,
+            resolutionX=width, resolutionY=height, fps=fps))
+        self.color_stream = self.device.create_color_stream()
+        self.color_stream.start()
+        self.color_stream.set_video_mode(c_api.OniVideoMode(
+            pixelFormat=c_api.OniPixelFormat.ONI_PIXEL_FORMAT_RGB888,
+            resolutionX=width, resolutionY=height, fps=fps))
+        self.device.set_image_registration_mode(c_api.OniImageRegistrationMode.ONI_IMAGE_REGISTRATION_DEPTH_TO_COLOR)
+
+    def read_timestamped(self):
+        depth_frame = self.depth_stream.read_frame()
+        color_frame = self.color_stream.read_frame()
+        timestamp = time.perf_counter()
+        # Depth in units of 100 micrometers, wrapped without copying. The view
+        # points into the OpenNI frame, which is kept alive until the next read.
+        depth = np.frombuffer(depth_frame.get_buffer_as_uint16(), dtype=np.uint16)
+        self.depth_frame = depth_frame
+        self.paired_frames = {"depth": depth.reshape(self.height, self.width)}
+        rgb = np.frombuffer(color_frame.get_buffer_as_uint8(), dtype=np.uint8).reshape(self.height, self.width, 3)
+        return True, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), timestamp
+
+    def release(self):
+        self.depth_stream.stop()
+        self.color_stream.stop()
+        openni2.unload()
+
+
+class FrameRecorder:
+    def __init__(self, path):
+        """
+        Records raw frames and their capture times into a directory.
+
+        Every stream is stored as `<stream>.raw` (frames back to back, no
+        compression) plus `<stream>.times` (float64 capture times), so a
+        replay can memory-map it without decoding. `meta.json` holds the
+        frame shape and dtype of each stream. Files are only appended to,
+        so a recording cut short by a crash stays readable.
+
+        Parameters:
+        - path: Directory of the recording (created if needed).
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.streams = {}  # Stream name -> {"shape", "dtype"}
+        self.files = {}  # Stream name -> (frame file, time file)
+        self.lock = threading.Lock()
+
+    def write(self, stream, frame, timestamp):
+        """
+        Appends one frame to a stream, e.g. "color", "depth", "left" or "right".
+        """
+        frame = np.ascontiguousarray(frame)
+        with self.lock:
+            meta = self.streams.get(stream)
+            if meta is None:
+                meta = self.streams[stream] = {"shape": list(frame.shape), "dtype": frame.dtype.str}
+                self.files[stream] = (open(os.path.join(self.path, stream + ".raw"), "wb"),
+                                      open(os.path.join(self.path, stream + ".times"), "wb"))
+                with open(os.path.join(self.path, "meta.json"), "w") as file:
+                    json.dump({"streams": self.streams}, file, indent=2)
+            elif list(frame.shape) != meta["shape"] or frame.dtype.str != meta["dtype"]:
+                raise ValueError(f"Frame shape or dtype changed within stream '{stream}'.")
+            frame_file, time_file = self.files[stream]
+            frame_file.write(frame.data)
+            time_file.write(np.float64(timestamp).tobytes())
+
+    def close(self):
+        with self.lock:
+            for frame_file, time_file in self.files.values():
+                frame_file.close()
+                time_file.close()
+            self.files = {}
+
+
+class RecordingSource(FrameSource):
+    def __init__(self, source, recorder, stream="color"):
+        """
+        Passes frames through from another source while recording them,
+        together with its paired frames under their own stream names.
+        Several sources can share one recorder; close it after releasing them.
+        """
+        super().__init__()
+        self.source = source
+        self.recorder = recorder
+        self.stream = stream
+
+    def read_timestamped(self):
+        ret, frame, timestamp = read_timestamped(self.source)
+        if ret:
+            self.recorder.write(self.stream, frame, timestamp)
+            self.paired_frames = getattr(self.source, "paired_frames", {})
+            for name, paired in self.paired_frames.items():
+                self.recorder.write(name, paired, timestamp)
+        return ret, frame, timestamp
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def release(self):
+        self.source.release()
+
+
+class Recording:
+    def __init__(self, path):
+        """
+        Memory-maps a directory written by FrameRecorder.
+
+        All replay sources of a recording share one clock: recorded capture
+        times are shifted so the earliest frame of the recording plays at the
+        moment the first frame is read, which keeps stereo streams in step.
+
+        Parameters:
+        - path: Directory of the recording.
+        """
+        with open(os.path.join(path, "meta.json")) as file:
+            meta = json.load(file)
+        self.frames = {}
+        self.timestamps = {}
+        for stream, info in meta["streams"].items():
+            times = np.fromfile(os.path.join(path, stream + ".times"), dtype=np.float64)
+            frame_path = os.path.join(path, stream + ".raw")
+            frame_size = int(np.prod(info["shape"])) * np.dtype(info["dtype"]).itemsize
+            count = min(len(times), os.path.getsize(frame_path) // frame_size)
+            if count == 0:
+                continue
+            self.frames[stream] = np.memmap(frame_path, dtype=np.dtype(info["dtype"]), mode="r",
+                                            shape=(count, *info["shape"]))
+            self.timestamps[stream] = times[:count]
+        if not self.frames:
+            raise Exception("Recording contains no frames.")
+        self.first_timestamp = min(times[0] for times in self.timestamps.values())
+        self.start_time = None
+        self.last_read = None  # (replay time, perf_counter time) of the newest frame read
+        self.lock = threading.Lock()
+
+    def replay_time(self, recorded_time):
+        """
+        Maps a recorded capture time onto the replay clock.
+        """
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = time.perf_counter()
+        return self.start_time + (recorded_time - self.first_timestamp)
+
+    def now(self):
+        """
+        Returns the current time on the replay clock: the replay time of the
+        newest frame read plus the time since it was read. In realtime
+        playback this follows perf_counter(); a fast replay runs ahead of it.
+        """
+        with self.lock:
+            if self.last_read is None:
+                return time.perf_counter()
+            replay_time, read_time = self.last_read
+        return replay_time + (time.perf_counter() - read_time)
+
+    def _mark_read(self, replay_time):
+        with self.lock:
+            self.last_read = (replay_time, time.perf_counter())
+
+    def source(self, stream="color", realtime=True, paired=()):
+        """
+        Returns a ReplaySource for one stream of the recording.
+        """
+        return ReplaySource(self, stream, realtime, paired)
+
+    def nearest(self, stream, timestamp, tolerance=None):
+        """
+        Returns the frame of a stream recorded closest to a replay-clock time,
+        or None if it is further away than tolerance (in seconds).
+        """
+        times = self.timestamps[stream]
+        recorded_time = timestamp - self.replay_time(self.first_timestamp) + self.first_timestamp
+        index = min(int(np.searchsorted(times, recorded_time)), len(times) - 1)
+        if index > 0 and recorded_time - times[index - 1] < times[index] - recorded_time:
+            index -= 1
+        if tolerance is not None and abs(times[index] - recorded_time) > tolerance:
+            return None
+        return self.frames[stream][index]
+
+
+class ReplaySource(FrameSource):
+    def __init__(self, recording, stream="color", realtime=True, paired=()):
+        """
+        Plays back one stream of a Recording.
+
+        Parameters:
+        - recording: The Recording to play.
+        - stream: Name of the stream returned by read().
+        - realtime: If True, frames are released at their original timing;
+          otherwise as fast as they are read. Timestamps always follow the
+          recorded timing, so tracking results do not depend on the mode.
+        - paired: Names of other streams whose frame closest in time is put
+          in paired_frames, e.g. ("depth",) for an Orbbec recording.
+        """
+        super().__init__()
+        if stream not in recording.frames:
+            raise ValueError(f"Recording has no stream '{stream}'.")
+        self.recording = recording
+        self.frames = recording.frames[stream]
+        self.times = recording.timestamps[stream]
+        self.realtime = realtime
+        self.paired = paired
+        self.index = 0
+        self.released = False
+
+    def read_timestamped(self):
+        if self.released:
+            return False, None, None
+        if self.index >= len(self.frames):
+            self.ended = True
+            return False, None, None
+        timestamp = self.recording.replay_time(self.times[self.index])
+        if self.realtime:
+            delay = timestamp - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        # Frames are read-only views into the memory map; copy to draw on them
+        frame = np.array(self.frames[self.index])
+        self.paired_frames = {name: self.recording.nearest(name, timestamp) for name in self.paired}
+        self.index += 1
+        self.recording._mark_read(timestamp)
+        return True, frame, timestamp
+
+    def now(self):
+        return self.recording.now()
+
+    def isOpened(self):
+        return not self.released
+
+    def release(self):
+        self.released = True
@@ -0,0 +1,188 @@
+import cProfile
+import csv
+import json
+import threading
+import time
+import numpy as np
+
+
+class _Span:
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+# Shared by every span of a disabled Instrumentation, so nothing is allocated or timed
+_NULL_SPAN = _NullSpan()
+
+
+class Instrumentation:
+    def __init__(self, enabled=True, window=1000, profile_start=None, profile_frames=100,
+                 profile_path="profile.prof"):
+        """
+        Times named stages of the frame loop with perf_counter_ns.
+
+        Usage:
+            with instrumentation.span("detect_ball"):
+                ...
+            instrumentation.frame()  # Once per loop iteration
+
+        The last `window` durations of each span are kept in a ring buffer,
+        from which rolling percentiles are computed on demand. When disabled,
+        span() returns a shared no-op context manager and frame() returns
+        immediately.
+
+        Parameters:
+        - enabled: Whether timings are recorded.
+        - window: Number of recent samples kept per span.
+        - profile_start: Frame number at which cProfile starts, or None for no profiling.
+        - profile_frames: Number of frames profiled from profile_start.
+        - profile_path: File the cProfile statistics are written to (view with
+          `python -m pstats` or snakeviz). Only the thread calling frame() is profiled.
+        """
+        if window < 1:
+            raise ValueError("Window must be at least 1.")
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}  # Span name -> int64 ring buffer of durations (ns)
+        self.counts = {}  # Span name -> number of samples ever recorded
+        self.lock = threading.Lock()
+        self.frame_count = 0
+        self.last_frame_time = None
+
+        self.profile_start = profile_start
+        self.profile_frames = profile_frames
+        self.profile_path = profile_path
+        self.profiler = None
+
+    def span(self, name):
+        """
+        Returns a context manager timing the enclosed block under `name`.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, duration_ns):
+        """
+        Adds a duration (in nanoseconds) measured elsewhere, e.g. by a pipeline stage.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = np.zeros(self.window, dtype=np.int64)
+                self.counts[name] = 0
+            samples[self.counts[name] % self.window] = duration_ns
+            self.counts[name] += 1
+
+    def frame(self):
+        """
+        Marks the end of a loop iteration: records the frame time and starts
+        or stops the cProfile window.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        if self.last_frame_time is not None:
+            self.record("frame", now - self.last_frame_time)
+        self.last_frame_time = now
+        self.frame_count += 1
+
+        if self.profile_start is None:
+            return
+        if self.frame_count == self.profile_start:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profiler is not None and self.frame_count >= self.profile_start + self.profile_frames:
+            self._stop_profiler()
+
+    def _stop_profiler(self):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.profile_path)
+        self.profiler = None
+        self.profile_start = None
+
+    def fps(self):
+        """
+        Returns the frame rate over the recent window, or None before two frames.
+        """
+        with self.lock:
+            samples = self.samples.get("frame")
+            if samples is None:
+                return None
+            mean_ns = samples[:min(self.counts["frame"], self.window)].mean()
+        return 1e9 / mean_ns if mean_ns > 0 else None
+
+    def summary(self):
+        """
+        Computes rolling statistics of every span.
+
+        Returns:
+        - A dict mapping span names to count, mean, p50, p95, p99 and max
+          durations (in milliseconds) over the recent window.
+        """
+        with self.lock:
+            snapshot = {name: (samples[:min(self.counts[name], self.window)].copy(), self.counts[name])
+                        for name, samples in self.samples.items()}
+        summary = {}
+        for name, (samples, count) in snapshot.items():
+            milliseconds = samples / 1e6
+            p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+            summary[name] = {
+                "count": count,
+                "mean_ms": float(milliseconds.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(milliseconds.max()),
+            }
+        return summary
+
+    def export(self, path):
+        """
+        Writes the summary to a .json or .csv file, depending on the extension.
+        """
+        summary = self.summary()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["span", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+                for name, stats in summary.items():
+                    writer.writerow([name, stats["count"], stats["mean_ms"], stats["p50_ms"],
+                                     stats["p95_ms"], stats["p99_ms"], stats["max_ms"]])
+        elif path.endswith(".json"):
+            with open(path, "w") as file:
+                json.dump(summary, file, indent=2)
+        else:
+            raise ValueError("Export path must end with .json or .csv.")
+
+    def close(self, export_path=None):
+        """
+        Finishes an unfinished cProfile window and optionally exports the summary.
+        """
+        if self.profiler is not None:
+            self._stop_profiler()
+        if self.enabled and export_path:
+            self.export(export_path)
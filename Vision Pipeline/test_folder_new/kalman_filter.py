@@ -0,0 +1,168 @@
+import numpy as np
+
+
+class ConstantAccelerationKalman:
+    def __init__(self, n_tracks=1, process_noise=5e4, measurement_noise=4.0,
+                 gravity=0.0, initial_velocity_variance=1e6, initial_acceleration_variance=1e6):
+        """
+        Pure-NumPy Kalman filter with a 6-state constant-acceleration model.
+
+        The state of every track is [x, y, vx, vy, ax, ay] in pixels and
+        seconds, so predict() takes the true frame interval from the capture
+        timestamps. All state, covariance and scratch buffers are allocated
+        once; predict() and correct() work in place and filter all n_tracks
+        tracks in one batched step.
+
+        Parameters:
+        - n_tracks: Number of independent tracks filtered together.
+        - process_noise: Spectral density of the white-noise jerk (pixels^2/s^5).
+        - measurement_noise: Variance of a detected position (pixels^2).
+        - gravity: Expected vertical acceleration (pixels/s^2, image y points down).
+          Used as the initial ay of every track; 0 gives a plain constant-acceleration model.
+        - initial_velocity_variance: Velocity variance of a newly initialized track.
+        - initial_acceleration_variance: Acceleration variance of a newly initialized track.
+        """
+        if n_tracks < 1:
+            raise ValueError("Number of tracks must be at least 1.")
+        self.n_tracks = n_tracks
+        self.process_noise = process_noise
+        self.gravity = gravity
+        self.measurement_noise = np.eye(2) * measurement_noise
+        self.initial_covariance = np.diag([measurement_noise, measurement_noise,
+                                           initial_velocity_variance, initial_velocity_variance,
+                                           initial_acceleration_variance, initial_acceleration_variance])
+
+        self.states = np.zeros((n_tracks, 6))
+        self.states[:, 5] = gravity
+        self.covariances = np.repeat(self.initial_covariance[None], n_tracks, axis=0)
+        self.initialized = np.zeros(n_tracks, dtype=bool)
+
+        self.transition = np.eye(6)
+        self.transition_noise = np.zeros((6, 6))
+        self.dt = None
+
+        # Scratch buffers reused by every call
+        self._states = np.empty((n_tracks, 6))
+        self._covariances = np.empty((n_tracks, 6, 6))
+        self._innovation = np.empty((n_tracks, 2))
+        self._innovation_covariance = np.empty((n_tracks, 2, 2))
+        self._inverse_covariance = np.empty((n_tracks, 2, 2))
+        self._determinant = np.empty(n_tracks)
+        self._determinant_term = np.empty(n_tracks)
+        self._measurements = np.empty((n_tracks, 2))
+        self._unmeasured = np.empty((n_tracks, 1, 1), dtype=bool)
+        self._gain = np.empty((n_tracks, 6, 2))
+        self._state_update = np.empty((n_tracks, 6, 1))
+        self._covariance_update = np.empty((n_tracks, 6, 6))
+
+    def _set_dt(self, dt):
+        if dt == self.dt:
+            return
+        self.dt = dt
+        half_dt2 = 0.5 * dt * dt
+        for axis in (0, 1):
+            self.transition[axis, axis + 2] = dt
+            self.transition[axis, axis + 4] = half_dt2
+            self.transition[axis + 2, axis + 4] = dt
+
+        # Discrete white-noise jerk model, identical for both axes
+        q = self.process_noise
+        block = q * np.array([[dt ** 5 / 20, dt ** 4 / 8, dt ** 3 / 6],
+                              [dt ** 4 / 8, dt ** 3 / 3, dt ** 2 / 2],
+                              [dt ** 3 / 6, dt ** 2 / 2, dt]])
+        for axis in (0, 1):
+            index = [axis, axis + 2, axis + 4]
+            self.transition_noise[np.ix_(index, index)] = block
+
+    def reset(self, index, position):
+        """
+        Starts track `index` at a measured (x, y) position with unknown velocity.
+        """
+        self.states[index] = (position[0], position[1], 0.0, 0.0, 0.0, self.gravity)
+        self.covariances[index] = self.initial_covariance
+        self.initialized[index] = True
+
+    def predict(self, dt):
+        """
+        Advances all tracks by dt seconds.
+
+        Parameters:
+        - dt: Time since the previous frame (in seconds).
+
+        Returns:
+        - positions: (n_tracks, 2) view of the predicted positions.
+        """
+        self._set_dt(dt)
+        np.matmul(self.states, self.transition.T, out=self._states)
+        self.states, self._states = self._states, self.states
+        np.matmul(self.transition, self.covariances, out=self._covariances)
+        np.matmul(self._covariances, self.transition.T, out=self.covariances)
+        self.covariances += self.transition_noise
+        return self.states[:, :2]
+
+    def correct(self, measurements, mask=None):
+        """
+        Corrects all tracks with their measured positions.
+
+        Nothing is allocated when measurements (and mask) are NumPy arrays;
+        lists and tuples are converted while copying into the scratch buffer.
+
+        Parameters:
+        - measurements: (n_tracks, 2) array of measured positions (or one (x, y) for a single track).
+        - mask: Optional boolean array; tracks with False keep their prediction
+          (their measurements are ignored and may be NaN).
+
+        Returns:
+        - positions: (n_tracks, 2) view of the corrected positions.
+        """
+        measurements_buffer = self._measurements
+        measurements_buffer[...] = measurements
+
+        # S = H P H^T + R with H selecting the position, inverted in closed form
+        S = self._innovation_covariance
+        np.add(self.covariances[:, :2, :2], self.measurement_noise, out=S)
+        np.multiply(S[:, 0, 0], S[:, 1, 1], out=self._determinant)
+        np.multiply(S[:, 0, 1], S[:, 1, 0], out=self._determinant_term)
+        self._determinant -= self._determinant_term
+        inverse = self._inverse_covariance
+        np.divide(S[:, 1, 1], self._determinant, out=inverse[:, 0, 0])
+        np.divide(S[:, 0, 0], self._determinant, out=inverse[:, 1, 1])
+        np.divide(S[:, 0, 1], self._determinant, out=inverse[:, 0, 1])
+        np.divide(S[:, 1, 0], self._determinant, out=inverse[:, 1, 0])
+        np.negative(inverse[:, 0, 1], out=inverse[:, 0, 1])
+        np.negative(inverse[:, 1, 0], out=inverse[:, 1, 0])
+
+        # K = P H^T S^-1; unmeasured tracks get a zero gain and a zero innovation
+        # (a zero gain alone would still spread a NaN placeholder: 0 * NaN = NaN)
+        np.matmul(self.covariances[:, :, :2], inverse, out=self._gain)
+        np.subtract(measurements_buffer, self.states[:, :2], out=self._innovation)
+        if mask is not None:
+            unmeasured = self._unmeasured
+            np.logical_not(mask, out=unmeasured[:, 0, 0])
+            np.copyto(self._gain, 0.0, where=unmeasured)
+            np.copyto(self._innovation, 0.0, where=unmeasured[:, 0])
+
+        np.matmul(self._gain, self._innovation[:, :, None], out=self._state_update)
+        self.states += self._state_update[:, :, 0]
+        np.matmul(self._gain, self.covariances[:, :2, :], out=self._covariance_update)
+        self.covariances -= self._covariance_update
+        return self.states[:, :2]
+
+    def position_covariances(self):
+        """
+        Returns a (n_tracks, 2, 2) view of the position covariances.
+        """
+        return self.covariances[:, :2, :2]
+
+
+if __name__ == "__main__":
+    # Masked correction check: an unmeasured track with a NaN placeholder keeps its prediction
+    kalman = ConstantAccelerationKalman(n_tracks=2)
+    kalman.reset(0, (100.0, 200.0))
+    kalman.reset(1, (300.0, 400.0))
+    predicted = kalman.predict(1 / 30).copy()
+    corrected = kalman.correct([[101.0, 201.0], [np.nan, np.nan]], mask=[True, False])
+    assert np.isfinite(kalman.states).all() and np.isfinite(kalman.covariances).all(), "NaN spread into the filter"
+    assert np.array_equal(corrected[1], predicted[1]), "Unmeasured track did not keep its prediction"
+    assert not np.array_equal(corrected[0], predicted[0]), "Measured track was not corrected"
+    print("Masked correction check passed")
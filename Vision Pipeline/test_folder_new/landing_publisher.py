@@ -0,0 +1,233 @@
+import socket
+import struct
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# OSC argument layout of a landing message: sequence number, capture and
+# publish times (Unix epoch seconds, so other processes and hosts can use
+# them), landing x, its 1-sigma uncertainty and the time left until landing
+LANDING_TAGS = "iddfff"
+LANDING_FIELDS = ("sequence", "capture_time", "publish_time", "landing_x", "landing_std", "time_to_landing")
+# Metric predictions (Trajectory3DPredictor) go to `<address>/world` and also
+# carry the forward floor coordinate; positions are in meters
+LANDING_WORLD_TAGS = "iddffff"
+LANDING_WORLD_FIELDS = ("sequence", "capture_time", "publish_time", "landing_x", "landing_y", "landing_std",
+                        "time_to_landing")
+
+
+def _osc_string(text):
+    # OSC strings are null-terminated and padded to a multiple of 4 bytes
+    data = text.encode() + b"\0"
+    return data + b"\0" * (-len(data) % 4)
+
+
+def encode_osc(address, tags, values):
+    """
+    Builds an OSC 1.0 message with int32 (i), float32 (f) and float64 (d) arguments.
+    """
+    return _osc_string(address) + _osc_string("," + tags) + struct.pack(">" + tags, *values)
+
+
+def decode_osc(data):
+    """
+    Parses a message built by encode_osc.
+
+    Returns:
+    - (address, values)
+    """
+    address_end = data.index(b"\0")
+    address = data[:address_end].decode()
+    tags_start = address_end + 1 + (-(address_end + 1) % 4)
+    tags_end = data.index(b"\0", tags_start)
+    tags = data[tags_start + 1:tags_end].decode()
+    values_start = tags_end + 1 + (-(tags_end + 1) % 4)
+    return address, struct.unpack_from(">" + tags, data, values_start)
+
+
+class LandingPublisher:
+    def __init__(self, host="127.0.0.1", port=8888, address="/landing", unix_path=None, latency_window=300,
+                 clock=time.perf_counter):
+        """
+        Sends landing predictions to the robot controller as OSC messages.
+
+        publish() only stores the prediction and wakes a sender thread, so the
+        frame loop never waits on the network. If several predictions arrive
+        before the sender runs, only the newest one is sent (the others are
+        counted in `coalesced`). Every sent message carries a sequence number,
+        so the receiver can detect gaps and reordering.
+
+        Capture times are passed in on the clock of the frame source and
+        converted to the epoch when the message is sent: the capture is
+        stamped as time.time() minus its age on that clock. The latency is
+        measured on the same clock, so it stays correct for a replayed
+        recording, whose clock does not follow perf_counter() in fast mode.
+
+        Parameters:
+        - host, port: UDP destination (the Orbbec notebook uses 127.0.0.1:8888).
+        - address: OSC address pattern of the messages.
+        - unix_path: Path of a local datagram socket to send to instead of UDP.
+        - latency_window: Number of recent messages kept for latency_stats().
+        - clock: Function returning the current time on the clock of the
+          capture times, e.g. CameraFeed.now.
+        """
+        self.address = address
+        self.clock = clock
+        if unix_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.destination = unix_path
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.destination = (host, port)
+        self.socket.setblocking(False)
+
+        self.latest = None
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.coalesced = 0
+        self.send_errors = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="LandingPublisher", daemon=True)
+        self.thread.start()
+
+    def publish(self, landing_x, landing_std, time_to_landing, capture_time, landing_y=None):
+        """
+        Queues a landing prediction, replacing one that was not sent yet.
+
+        Parameters:
+        - landing_x: Predicted landing position.
+        - landing_std: Its 1-sigma uncertainty, or None if unknown (sent as NaN).
+        - time_to_landing: Time until the ball lands (in seconds).
+        - capture_time: Capture time of the frame it is based on, on the publisher's clock.
+        - landing_y: Forward floor coordinate of a metric prediction; if given,
+          the message is sent to `<address>/world`.
+        """
+        landing_std = float("nan") if landing_std is None else landing_std
+        if landing_y is None:
+            prediction = (self.address, LANDING_TAGS, capture_time, (landing_x, landing_std, time_to_landing))
+        else:
+            prediction = (self.address + "/world", LANDING_WORLD_TAGS, capture_time,
+                          (landing_x, landing_y, landing_std, time_to_landing))
+        with self.condition:
+            if self.latest is not None:
+                self.coalesced += 1
+            self.latest = prediction
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and self.latest is None:
+                    self.condition.wait()
+                if self.latest is None:  # Closed, and the last prediction was sent
+                    return
+                prediction, self.latest = self.latest, None
+            address, tags, capture_time, values = prediction
+            self.sequence += 1
+            latency = self.clock() - capture_time
+            publish_time = time.time()
+            message = encode_osc(address, tags, (self.sequence, publish_time - latency, publish_time) + values)
+            try:
+                self.socket.sendto(message, self.destination)
+            except OSError:  # Full send buffer or no receiver; the next prediction supersedes this one
+                self.send_errors += 1
+                continue
+            self.latencies.append(latency)
+
+    def latency_stats(self):
+        """
+        Returns capture-to-publish latency percentiles (in milliseconds), or None.
+        """
+        if not self.latencies:
+            return None
+        latencies = np.array(self.latencies) * 1000
+        return {
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "max_ms": float(latencies.max()),
+        }
+
+    def close(self):
+        # The sender sends a pending prediction before it stops
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=1.0)
+        self.socket.close()
+
+
+class LandingReceiver:
+    def __init__(self, host="127.0.0.1", port=0, unix_path=None):
+        """
+        Receives LandingPublisher messages, e.g. on the controller side or in a
+        loopback check. port=0 picks a free port, available in `port`.
+        """
+        if unix_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.socket.bind(unix_path)
+            self.port = None
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.bind((host, port))
+            self.port = self.socket.getsockname()[1]
+
+    def receive(self, timeout=1.0):
+        """
+        Returns the next landing message as a dict (see LANDING_FIELDS and
+        LANDING_WORLD_FIELDS) with its time.time() receive time, or None on timeout.
+        """
+        self.socket.settimeout(timeout)
+        try:
+            data = self.socket.recv(1024)
+        except socket.timeout:
+            return None
+        address, values = decode_osc(data)
+        message = dict(zip(LANDING_WORLD_FIELDS if address.endswith("/world") else LANDING_FIELDS, values))
+        message["receive_time"] = time.time()
+        return message
+
+    def close(self):
+        self.socket.close()
+
+
+if __name__ == "__main__":
+    # Loopback check: publish at 1 kHz and report what a receiver sees
+    receiver = LandingReceiver()
+    messages = []
+
+    def receive_all():
+        message = receiver.receive(timeout=1.0)
+        while message is not None:
+            messages.append(message)
+            message = receiver.receive(timeout=0.2)
+
+    receiving = threading.Thread(target=receive_all)
+    receiving.start()
+    publisher = LandingPublisher(port=receiver.port)
+    for i in range(1000):
+        publisher.publish(0.5 + i * 1e-4, 0.02, 0.3, time.perf_counter())
+        time.sleep(0.001)
+    receiving.join()
+    publisher.close()
+    receiver.close()
+
+    sequences = [message["sequence"] for message in messages]
+    in_order = all(b > a for a, b in zip(sequences, sequences[1:]))
+    end_to_end = np.array([message["receive_time"] - message["capture_time"] for message in messages]) * 1000
+    print(f"Received {len(messages)} of {publisher.sequence} sent ({publisher.coalesced} coalesced, "
+          f"{publisher.send_errors} send errors), in order: {in_order}")
+    print(f"Capture to publish: {publisher.latency_stats()}")
+    print(f"Capture to receive: p50 {np.percentile(end_to_end, 50):.3f} ms, max {end_to_end.max():.3f} ms")
+
+    # Close check: a prediction published right before close() is still sent
+    receiver = LandingReceiver()
+    publisher = LandingPublisher(port=receiver.port)
+    publisher.publish(0.5, 0.02, 0.3, time.perf_counter())
+    publisher.close()
+    message = receiver.receive(timeout=1.0)
+    receiver.close()
+    assert message is not None, "Pending prediction was dropped by close()"
+    assert 0 <= message["publish_time"] - message["capture_time"] < 1.0, "Capture time is not an epoch time"
+    print("Close flush check passed")
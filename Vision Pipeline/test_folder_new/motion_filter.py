@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+
+
+class MotionFilter:
+    def __init__(self, method="running_average", scale=0.25, learning_rate=0.05, threshold=20, history=100):
+        """
+        Background model that marks the moving pixels of a frame.
+
+        The model runs on a downscaled grayscale copy of the frame, so keeping
+        it up to date costs far less than the color segmentation it gates,
+        and the mask is only scaled back up for the region being searched.
+        It is dilated by one downscaled pixel, so the edges of a moving ball
+        are not cut off.
+
+        Parameters:
+        - method: "running_average" (cv2.accumulateWeighted and a fixed
+          threshold) or "mog2" (cv2.BackgroundSubtractorMOG2, adapts to
+          per-pixel noise, slower).
+        - scale: Resolution factor of the model.
+        - learning_rate: Weight of the newest frame in the background model.
+        - threshold: Gray level difference to the background of a moving
+          pixel (running average), or the squared Mahalanobis distance (MOG2).
+        - history: Number of frames of the MOG2 model.
+        """
+        if method not in ("running_average", "mog2"):
+            raise ValueError("Method must be 'running_average' or 'mog2'.")
+        if not 0 < scale <= 1:
+            raise ValueError("Scale must be in (0, 1].")
+        self.method = method
+        self.scale = scale
+        self.learning_rate = learning_rate
+        self.threshold = threshold
+        self.history = history
+        self.kernel = np.ones((3, 3), np.uint8)
+        self.reset()
+
+    def reset(self):
+        self.subtractor = None
+        if self.method == "mog2":
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=self.history, varThreshold=self.threshold,
+                                                                 detectShadows=False)
+        self.background = None
+        self.small_mask = None
+        self.frame_size = None
+
+    def apply(self, frame):
+        """
+        Updates the background model with a frame. Call once per full frame, before detection.
+
+        Nothing counts as moving on the first frame, since there is no background yet.
+        """
+        height, width = frame.shape[:2]
+        size = (max(1, int(round(width * self.scale))), max(1, int(round(height * self.scale))))
+        # Bilinear subsampling is enough here and several times cheaper than INTER_AREA
+        gray = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR), cv2.COLOR_BGR2GRAY)
+
+        if self.method == "mog2":
+            small_mask = self.subtractor.apply(gray, learningRate=self.learning_rate)
+        elif self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            small_mask = np.zeros(gray.shape, np.uint8)
+        else:
+            difference = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+            _, small_mask = cv2.threshold(difference, self.threshold, 255, cv2.THRESH_BINARY)
+            cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+
+        self.small_mask = cv2.dilate(small_mask, self.kernel)
+        self.frame_size = (width, height)
+
+    def mask(self, region=None):
+        """
+        Returns the motion mask of the last frame at frame resolution.
+
+        Parameters:
+        - region: Optional (x, y, w, h) window; only this part is scaled up.
+
+        Returns:
+        - mask: uint8 mask (255 = moving) of the frame or the window.
+        """
+        width, height = self.frame_size
+        x, y, w, h = region if region is not None else (0, 0, width, height)
+        # Small-mask cells covering the window, scaled up and trimmed to it
+        small_height, small_width = self.small_mask.shape
+        x0, y0 = int(x * self.scale), int(y * self.scale)
+        x1 = min(small_width, int(np.ceil((x + w) * self.scale)))
+        y1 = min(small_height, int(np.ceil((y + h) * self.scale)))
+        cells = self.small_mask[y0:y1, x0:x1]
+        offset_x, offset_y = x - int(round(x0 / self.scale)), y - int(round(y0 / self.scale))
+        size = (int(round((x1 - x0) / self.scale)), int(round((y1 - y0) / self.scale)))
+        upscaled = cv2.resize(cells, size, interpolation=cv2.INTER_NEAREST)
+        window = upscaled[offset_y:offset_y + h, offset_x:offset_x + w]
+        if window.shape != (h, w):  # Rounding at the frame edge
+            window = cv2.copyMakeBorder(window, 0, h - window.shape[0], 0, w - window.shape[1],
+                                        cv2.BORDER_REPLICATE)
+        return window
@@ -1,17 +1,55 @@
 import cv2
 import numpy as np
+from kalman_filter import ConstantAccelerationKalman
 
 class MotionTracker:
-    def __init__(self):
+    def __init__(self, backend="opencv", default_dt=1 / 30, gravity=0.0):
+        """
+        Tracks the ball position with a Kalman filter.
+
+        Parameters:
+        - backend: "opencv" uses a constant-velocity cv2.KalmanFilter stepping one
+          frame at a time; "numpy" uses ConstantAccelerationKalman driven by the
+          real frame interval.
+        - default_dt: Frame interval assumed by the "numpy" backend when predict()
+          is called without dt (in seconds).
+        - gravity: Expected vertical acceleration for the "numpy" backend (pixels/s^2).
+        """
+        if backend not in ("opencv", "numpy"):
+            raise ValueError("Backend must be 'opencv' or 'numpy'.")
+        self.backend = backend
+        self.default_dt = default_dt
+        if backend == "numpy":
+            self.filter = ConstantAccelerationKalman(n_tracks=1, gravity=gravity)
+            return
+
         self.kalman = cv2.KalmanFilter(4, 2)
         self.kalman.measurementMatrix = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], np.float32)
         self.kalman.transitionMatrix = np.array([[1, 0, 1, 0], [0, 1, 0, 1], [0, 0, 1, 0], [0, 0, 0, 1]], np.float32)
         self.kalman.processNoiseCov = np.eye(4, dtype=np.float32) * 0.03
     
-    def predict(self):
+    def predict(self, dt=None):
+        # Sub-pixel (x, y) floats, like the detector's centroids; drawing code rounds them
+        if self.backend == "numpy":
+            predicted = self.filter.predict(self.default_dt if dt is None else dt)
+            return float(predicted[0, 0]), float(predicted[0, 1])
+
         predicted = self.kalman.predict()
-        return int(predicted[0]), int(predicted[1])
+        return float(predicted[0, 0]), float(predicted[1, 0])
     
     def correct(self, measured_center):
+        if self.backend == "numpy":
+            if not self.filter.initialized[0]:
+                self.filter.reset(0, measured_center)
+            else:
+                self.filter.correct(measured_center)
+            return
+
         measurement = np.array([[np.float32(measured_center[0])], [np.float32(measured_center[1])]])
         self.kalman.correct(measurement)
+
+    def position_covariance(self):
+        # Covariance of the last predicted (x, y) position, used to gate the detection window
+        if self.backend == "numpy":
+            return self.filter.position_covariances()[0].copy()
+        return self.kalman.errorCovPre[:2, :2].copy()
@@ -0,0 +1,165 @@
+import numpy as np
+from kalman_filter import ConstantAccelerationKalman
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # SciPy is optional; greedy assignment is used without it
+    linear_sum_assignment = None
+
+
+class MultiTracker:
+    def __init__(self, max_tracks=16, gate=20.0, max_misses=5, default_dt=1 / 30, process_noise=5e4,
+                 measurement_noise=4.0, gravity=0.0, assignment="hungarian"):
+        """
+        Tracks several balls at once with a pool of constant-acceleration Kalman filters.
+
+        The tracks are the slots of one ConstantAccelerationKalman, so
+        predicting and correcting all of them is one batched step driven by the
+        real frame interval, with the same pixel-scale noise model as
+        MotionTracker's "numpy" backend. Detections are matched to tracks
+        inside a Mahalanobis gate using Hungarian (SciPy) or greedy assignment,
+        and every track keeps a stable ID.
+
+        Parameters:
+        - max_tracks: Number of track slots; detections that find no free slot are ignored.
+        - gate: Squared Mahalanobis distance above which a detection cannot be
+          assigned to a track. The 99.9% chi-square bound for 2 DOF is 13.8; the
+          wider default keeps the ID when a ball merges with a distractor for a
+          frame and its detected centroid jumps.
+        - max_misses: Consecutive frames without a detection before a track is dropped.
+        - default_dt: Frame interval assumed when update() is called without dt (in seconds).
+        - process_noise: Spectral density of the white-noise jerk (pixels^2/s^5).
+        - measurement_noise: Variance of a detected position (pixels^2).
+        - gravity: Expected vertical acceleration (pixels/s^2, image y points down).
+        - assignment: "hungarian" (falls back to greedy without SciPy) or "greedy".
+        """
+        if assignment not in ("hungarian", "greedy"):
+            raise ValueError("Assignment must be 'hungarian' or 'greedy'.")
+        self.gate = gate
+        self.max_misses = max_misses
+        self.default_dt = default_dt
+        self.assignment = assignment
+        self.filter = ConstantAccelerationKalman(n_tracks=max_tracks, process_noise=process_noise,
+                                                 measurement_noise=measurement_noise, gravity=gravity)
+
+        self.active = np.zeros(max_tracks, dtype=bool)
+        self.ids = np.zeros(max_tracks, dtype=np.int64)
+        self.misses = np.zeros(max_tracks, dtype=np.int64)
+        self.next_id = 0
+        self._measurements = np.zeros((max_tracks, 2))
+        self._matched = np.zeros(max_tracks, dtype=bool)
+
+    def predict(self, dt=None):
+        """
+        Advances every track by dt seconds.
+
+        Returns:
+        - positions: (N, 2) array of the predicted positions of the live tracks.
+        """
+        positions = self.filter.predict(self.default_dt if dt is None else dt)
+        return positions[self.active]
+
+    def update(self, centers, dt=None):
+        """
+        Predicts all tracks, assigns the detections and corrects the matched tracks.
+
+        Parameters:
+        - centers: List of detected (x, y) centers, e.g. the centers returned by
+          BallDetector.detect_balls.
+        - dt: Time since the previous update (in seconds); defaults to default_dt.
+
+        Returns:
+        - A list of (track_id, (x, y)) tuples with the filtered position of every live track.
+        """
+        self.predict(dt)
+        measurements = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        slots = np.flatnonzero(self.active)
+
+        # Innovation covariance S = H P H^T + R and squared Mahalanobis distances (N, M)
+        innovation_covariances = self.filter.position_covariances()[slots] + self.filter.measurement_noise
+        inverse_covariances = np.linalg.inv(innovation_covariances) if len(slots) else innovation_covariances
+        residuals = measurements[None, :, :] - self.filter.states[slots, None, :2]
+        distances = np.einsum("nmi,nij,nmj->nm", residuals, inverse_covariances, residuals)
+
+        track_rows, detection_columns = self._assign(distances)
+
+        # Batched correction of the matched slots; all others keep their prediction
+        matched = self._matched
+        matched[:] = False
+        matched[slots[track_rows]] = True
+        self._measurements[slots[track_rows]] = measurements[detection_columns]
+        self.filter.correct(self._measurements, mask=matched)
+
+        self.misses[self.active] += 1
+        self.misses[matched] = 0
+        self.active &= self.misses <= self.max_misses
+
+        unmatched = np.setdiff1d(np.arange(len(measurements)), detection_columns)
+        free = np.flatnonzero(~self.active)
+        for slot, detection in zip(free, unmatched):
+            self.filter.reset(slot, measurements[detection])
+            self.active[slot] = True
+            self.ids[slot] = self.next_id
+            self.misses[slot] = 0
+            self.next_id += 1
+
+        return self.tracks()
+
+    def _assign(self, distances):
+        """
+        Matches tracks (rows) to detections (columns) inside the gate.
+
+        Returns:
+        - track_rows, detection_columns: Index arrays of the matched pairs.
+        """
+        if distances.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        if self.assignment == "hungarian" and linear_sum_assignment is not None:
+            # Pairs outside the gate get a cost that is never preferred over a valid pair
+            costs = np.where(distances <= self.gate, distances, self.gate * 1e6)
+            rows, columns = linear_sum_assignment(costs)
+            valid = distances[rows, columns] <= self.gate
+            return rows[valid], columns[valid]
+
+        # Greedy: accept the closest remaining pair until none is inside the gate
+        order = np.argsort(distances, axis=None)
+        rows, columns = np.unravel_index(order, distances.shape)
+        used_rows, used_columns = set(), set()
+        matched_rows, matched_columns = [], []
+        for row, column in zip(rows, columns):
+            if distances[row, column] > self.gate:
+                break
+            if row in used_rows or column in used_columns:
+                continue
+            used_rows.add(row)
+            used_columns.add(column)
+            matched_rows.append(row)
+            matched_columns.append(column)
+        return np.array(matched_rows, dtype=np.int64), np.array(matched_columns, dtype=np.int64)
+
+    def tracks(self):
+        return [(int(track_id), (float(x), float(y)))
+                for track_id, (x, y) in zip(self.ids[self.active], self.filter.states[self.active, :2])]
+
+
+if __name__ == "__main__":
+    # ID stability check: the ball keeps one track ID per throw among moving distractors
+    from ball_detection import BallDetector
+    from synthetic_scene import SyntheticScene
+
+    scene = SyntheticScene(1200, 720, flights=2, distractors=3, noise=4, seed=1)
+    detector = BallDetector([40, 70, 70], [80, 255, 255])
+    tracker = MultiTracker()
+    ball_ids = {}
+    for frame, _, truth in scene.frames():
+        tracks = tracker.update([center for center, _ in detector.detect_balls(frame)], 1.0 / scene.fps)
+        position = truth["position"]
+        if position is None or truth["visible"] < 0.5:
+            continue
+        nearest = min(tracks, key=lambda track: np.hypot(track[1][0] - position[0], track[1][1] - position[1]))
+        assert np.hypot(nearest[1][0] - position[0], nearest[1][1] - position[1]) <= truth["radius"], \
+            "Ball is not tracked"
+        ball_ids.setdefault(truth["flight"], set()).add(nearest[0])
+    assert all(len(ids) == 1 for ids in ball_ids.values()), f"Ball changed its track ID: {ball_ids}"
+    print("Track ID stability check passed")
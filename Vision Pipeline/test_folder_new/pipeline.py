@@ -0,0 +1,287 @@
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Marks the end of the stream in the stage queues
+_STOP = object()
+
+
+class FramePacket:
+    def __init__(self, sequence, capture_time):
+        """
+        Unit of work passed between pipeline stages.
+
+        Parameters:
+        - sequence: Consecutive number assigned by the pipeline source.
+        - capture_time: perf_counter() time at which the frame was captured.
+        """
+        self.sequence = sequence
+        self.capture_time = capture_time
+        self.data = {}
+        self.stage_times = {}  # Stage name -> (start, end) perf_counter() times
+        self.dropped = False  # Set by a stage to skip the remaining stages
+        self.error = None  # Exception raised by a stage; Pipeline.run() re-raises it
+
+
+def _process_worker(connection, function):
+    # Runs inside a child process; the stage function and its state live here
+    while True:
+        packet = connection.recv()
+        if packet is None:
+            break
+        try:
+            result = function(packet)
+        except Exception as e:  # Sent back, so the stage thread can report it
+            result = e
+        connection.send(result)
+    connection.close()
+
+
+class Stage:
+    def __init__(self, name, function, workers=1, use_process=False, queue_size=2):
+        """
+        One step of the pipeline, run by its own worker threads.
+
+        Most OpenCV calls release the GIL, so threads are enough for
+        detection, depth and drawing. Stages dominated by Python code can set
+        use_process=True: each worker thread then forwards packets to a
+        dedicated child process, at the cost of pickling the packet both ways.
+
+        Parameters:
+        - name: Stage name used in timing reports.
+        - function: Callable taking and returning a FramePacket. For process
+          stages it must be picklable and keeps its state in the child process.
+        - workers: Number of parallel workers. Only stateless stages should use
+          more than one; the stage output is put back in sequence order.
+        - use_process: Run the function in child processes instead of threads.
+        - queue_size: Capacity of the bounded input queue of this stage.
+        """
+        if workers < 1:
+            raise ValueError("A stage needs at least one worker.")
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.use_process = use_process
+        self.input = queue.Queue(maxsize=queue_size)
+        self.output = None
+        self.downstream_workers = 1
+        self.threads = []
+        self.processes = []
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._next_sequence = 0
+        self._running_workers = 0
+
+    def start(self, output, downstream_workers):
+        self.output = output
+        self.downstream_workers = downstream_workers
+        self._running_workers = self.workers
+        for index in range(self.workers):
+            connection = None
+            if self.use_process:
+                connection, child_connection = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_process_worker, args=(child_connection, self.function),
+                                                  name=f"{self.name}-{index}", daemon=True)
+                process.start()
+                self.processes.append(process)
+            thread = threading.Thread(target=self._run, args=(connection,), name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _run(self, connection):
+        try:
+            while True:
+                packet = self.input.get()
+                if packet is _STOP:
+                    break
+                if not packet.dropped:
+                    start = time.perf_counter()
+                    try:
+                        result = self._call(connection, packet)
+                    except Exception as e:
+                        # The packet still travels on, so the sink sees the error in sequence
+                        result = None
+                        packet.error = e
+                    if result is None:
+                        packet.dropped = True
+                    else:
+                        packet = result
+                    packet.stage_times[self.name] = (start, time.perf_counter())
+                self._emit(packet)
+        finally:
+            if connection is not None:
+                try:
+                    connection.send(None)
+                except OSError:  # Worker process already gone
+                    pass
+                connection.close()
+            with self._lock:
+                self._running_workers -= 1
+                if self._running_workers == 0:
+                    for _ in range(self.downstream_workers):
+                        self.output.put(_STOP)
+
+    def _call(self, connection, packet):
+        if connection is None:
+            return self.function(packet)
+        connection.send(packet)
+        result = connection.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _emit(self, packet):
+        if self.workers == 1:
+            self.output.put(packet)
+            return
+        # Parallel workers finish out of order; release packets by sequence
+        with self._lock:
+            self._pending[packet.sequence] = packet
+            while self._next_sequence in self._pending:
+                self.output.put(self._pending.pop(self._next_sequence))
+                self._next_sequence += 1
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+        for process in self.processes:
+            process.join(timeout=1.0)
+
+
+class Pipeline:
+    def __init__(self, source, stages, sink=None, queue_size=2, latency_window=300, instrumentation=None):
+        """
+        Runs capture, processing stages and an output sink concurrently.
+
+        Stages are connected by bounded queues, so a slow stage throttles the
+        source instead of letting frames pile up; with a threaded CameraFeed
+        the surplus frames are dropped at the camera and latency stays bounded.
+
+        Parameters:
+        - source: Callable returning (data, capture_time) for the next frame, or
+          None at the end of the stream. `data` is stored in packet.data. An
+          exception it raises ends the stream and is re-raised by run().
+        - stages: List of Stage objects, applied in order.
+        - sink: Callable receiving every finished FramePacket, in sequence order,
+          on the thread that calls run(). Returning False stops the pipeline.
+        - queue_size: Capacity of the queue between the last stage and the sink.
+        - latency_window: Number of recent frames kept for the latency statistics.
+        - instrumentation: Optional Instrumentation receiving the time of every
+          stage and the end-to-end latency of each packet.
+        """
+        self.source = source
+        self.stages = stages
+        self.sink = sink
+        self.instrumentation = instrumentation
+        self.output = queue.Queue(maxsize=queue_size)
+        self.latencies = deque(maxlen=latency_window)
+        self.frames_in = 0
+        self.frames_out = 0
+        self.running = False
+        self.source_thread = None
+        self.start_time = None
+
+    def start(self):
+        for stage, downstream in zip(self.stages, self.stages[1:] + [None]):
+            stage.start(downstream.input if downstream else self.output,
+                        downstream.workers if downstream else 1)
+        self.running = True
+        self.start_time = time.perf_counter()
+        self.source_thread = threading.Thread(target=self._feed, name="PipelineSource", daemon=True)
+        self.source_thread.start()
+
+    def _feed(self):
+        first = self.stages[0].input if self.stages else self.output
+        workers = self.stages[0].workers if self.stages else 1
+        try:
+            while self.running:
+                try:
+                    item = self.source()
+                except Exception as e:
+                    # Sent down the stages like a stage error, behind the frames already read
+                    packet = FramePacket(self.frames_in, None)
+                    packet.error = e
+                    packet.dropped = True
+                    first.put(packet)
+                    break
+                if item is None:
+                    break
+                data, capture_time = item
+                packet = FramePacket(self.frames_in, capture_time)
+                packet.data.update(data)
+                first.put(packet)
+                self.frames_in += 1
+        finally:
+            for _ in range(workers):
+                first.put(_STOP)
+
+    def run(self):
+        """
+        Starts the pipeline and delivers finished packets to the sink until the
+        source is exhausted or the sink returns False.
+
+        An exception raised by the source or a stage stops the pipeline and is
+        re-raised here, once the packets before the failed one have reached
+        the sink.
+        """
+        self.start()
+        try:
+            while True:
+                packet = self.output.get()
+                if packet is _STOP:
+                    break
+                if packet.error is not None:
+                    raise packet.error
+                self.frames_out += 1
+                latency = time.perf_counter() - packet.capture_time
+                self.latencies.append(latency)
+                if self.instrumentation is not None:
+                    for name, (start, end) in packet.stage_times.items():
+                        self.instrumentation.record(name, int((end - start) * 1e9))
+                    self.instrumentation.record("latency", int(latency * 1e9))
+                if self.sink is not None and self.sink(packet) is False:
+                    break
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        # Drain the output so blocked stages can reach the end of the stream
+        while self.source_thread is not None and self.source_thread.is_alive():
+            self._drain()
+            self.source_thread.join(timeout=0.05)
+        for stage in self.stages:
+            while any(thread.is_alive() for thread in stage.threads):
+                self._drain()
+                for thread in stage.threads:
+                    thread.join(timeout=0.05)
+            stage.join()
+
+    def _drain(self):
+        try:
+            while True:
+                self.output.get_nowait()
+        except queue.Empty:
+            pass
+
+    def latency_stats(self):
+        """
+        Returns end-to-end (capture to sink) latency percentiles and throughput.
+
+        Returns:
+        - A dict with p50, p95 and max latency (in milliseconds) and fps.
+        """
+        if not self.latencies:
+            return None
+        latencies = np.array(self.latencies) * 1000
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "max_ms": float(latencies.max()),
+            "fps": self.frames_out / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,129 @@
+import argparse
+import os
+import time
+import cv2
+from camera_feed import CameraFeed
+from camera_group import CameraGroup
+from ball_detection import BallDetector
+from motion_tracking import MotionTracker
+from trajectory_prediction import TrajectoryPredictor
+from visualization import Visualizer
+from depth_map import DepthMap
+from calibration import StereoCalibration
+from display import Display
+from instrumentation import Instrumentation
+from pipeline import Pipeline, Stage
+from trajectory_buffer import TrajectoryBuffer
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--headless", action="store_true", help="No window and no drawing (on the robot)")
+parser.add_argument("--instrument", action="store_true", help="Record per-stage timings to timings.json")
+# Written by calibration.py; without it the cameras are assumed to be rectified
+calibration_file = "stereo_calibration.npz"
+
+# Same processing as test.py, but every step runs concurrently on its own
+# worker(s) so throughput is bounded by the slowest stage instead of the sum.
+
+
+class DetectionStage:
+    def __init__(self):
+        self.detector = BallDetector(lower_color_range=[40, 70, 70], upper_color_range=[80, 255, 255])
+
+    def __call__(self, packet):
+        packet.data["center"], packet.data["bounding_box"] = self.detector.detect_ball(packet.data["frame"])
+        return packet
+
+
+class TrackingStage:
+    def __init__(self):
+        self.tracker = MotionTracker(backend="numpy")
+        self.predictor = TrajectoryPredictor()
+        self.prev_capture_time = None
+
+    def __call__(self, packet):
+        dt = packet.capture_time - self.prev_capture_time if self.prev_capture_time is not None else None
+        self.prev_capture_time = packet.capture_time
+        packet.data["predicted_center"] = self.tracker.predict(dt)
+        center = packet.data["center"]
+        if center:
+            self.tracker.correct(center)
+            self.predictor.update_positions(center, packet.capture_time)
+        else:
+            self.predictor.miss()  # Clears the fit once the flight is over
+        packet.data["predicted_landing"] = self.predictor.predict_landing(floor_y=720)
+        return packet
+
+
+class DepthStage:
+    def __init__(self):
+        if os.path.exists(calibration_file):
+            calibration = StereoCalibration.load(calibration_file)
+            calibration.init_rectification()
+            self.depth_estimator = DepthMap(calibration=calibration)
+        else:
+            self.depth_estimator = DepthMap(baseline=0.1, focal_length=700)
+
+    def __call__(self, packet):
+        stereo_frames, bounding_box = packet.data.pop("stereo_frames"), packet.data["bounding_box"]
+        packet.data["distance"] = None
+        if stereo_frames is not None and bounding_box:
+            packet.data["distance"], _ = self.depth_estimator.estimate_depth_in_box(*stereo_frames, bounding_box)
+        return packet
+
+
+class DisplaySink:
+    def __init__(self, display):
+        self.display = display
+        self.visualizer = Visualizer()
+        self.trail_points = TrajectoryBuffer(capacity=50)
+        self.predicted_trail_points = TrajectoryBuffer(capacity=50)
+
+    def __call__(self, packet):
+        frame, center = packet.data["frame"], packet.data["center"]
+        if center:
+            self.trail_points.append(center, packet.capture_time)
+        self.predicted_trail_points.append(packet.data["predicted_center"], packet.capture_time)
+        if not self.display.wants_frame():
+            return not self.display.exit_requested()
+
+        self.visualizer.draw_ball_info(frame, center, packet.data["bounding_box"])
+        self.visualizer.draw_trajectory(frame, self.trail_points, color=(255, 0, 0))
+        self.visualizer.draw_trajectory(frame, self.predicted_trail_points, color=(0, 255, 255))
+        if packet.data["distance"] is not None:
+            cv2.putText(frame, f"Distance: {packet.data['distance']:.2f} m", (10, 150),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        latency = (time.perf_counter() - packet.capture_time) * 1000
+        cv2.putText(frame, f"Latency: {latency:.0f} ms", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self.display.publish("Ball Tracking Pipeline", frame)
+        return not self.display.exit_requested()
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    camera = CameraFeed(width=1200, height=720, threaded=True)
+    left_camera = CameraFeed(width=1200, height=720, threaded=True, buffer_size=4)
+    right_camera = CameraFeed(width=1200, height=720, threaded=True, buffer_size=4)
+    stereo_cameras = CameraGroup([left_camera, right_camera], tolerance=0.010, policy="reject")
+    display = Display(rate=15, headless=args.headless).start()
+    instrumentation = Instrumentation(enabled=args.instrument)
+
+    def read_frames():
+        frame = camera.get_frame()
+        return {"frame": frame, "stereo_frames": stereo_cameras.get_frames()}, camera.last_timestamp
+
+    pipeline = Pipeline(read_frames, [
+        Stage("detect", DetectionStage(), workers=2),
+        Stage("track", TrackingStage()),
+        Stage("depth", DepthStage()),
+    ], sink=DisplaySink(display), instrumentation=instrumentation)
+
+    try:
+        pipeline.run()
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        print(f"Pipeline latency: {pipeline.latency_stats()}")
+        display.stop()
+        camera.release()
+        stereo_cameras.release()
+        instrumentation.close(export_path="timings.json")
@@ -2,16 +2,20 @@ import cv2
 import numpy as np
 
 class SingleCameraDistanceEstimator:
-    def __init__(self, known_width, focal_length):
+    def __init__(self, known_width, focal_length=None, calibration=None):
         """
         Initializes the single-camera distance estimator.
 
         Parameters:
         - known_width: The real-world width of the object (e.g., in meters).
         - focal_length: The focal length of the camera (in pixels), derived from calibration.
+        - calibration: Optional StereoCalibration whose left camera focal length
+          is used instead: the horizontal focal length of the unrectified
+          camera matrix, as boxes are measured in the raw frames. (The
+          rectified calibration.focal_length applies to rectified frames only.)
         """
         self.known_width = known_width
-        self.focal_length = focal_length
+        self.focal_length = float(calibration.camera_matrix_left[0, 0]) if calibration is not None else focal_length
 
     def estimate_distance(self, bounding_box_width):
         """
@@ -23,7 +27,7 @@ class SingleCameraDistanceEstimator:
         Returns:
         - distance: The estimated distance from the object to the camera (in meters).
         """
-        if bounding_box_width <= 0:
+        if bounding_box_width <= 0 or self.focal_length is None:
             return None
         distance = (self.known_width * self.focal_length) / bounding_box_width
         return distance
@@ -0,0 +1,248 @@
+import time
+import cv2
+import numpy as np
+from frame_source import FrameSource
+
+GRAVITY = 9.81  # m/s^2
+DEPTH_UNIT = 1e-4  # Meters per raw depth value, as in the Orbbec depth stream
+
+
+class SyntheticScene:
+    def __init__(self, width=1200, height=720, fps=30, flights=3, speed=1.0, depth=2.0, depth_speed=0.0,
+                 ball_radius=0.06, ball_color=(40, 200, 40), noise=0.0, lighting=0.0, dimming=0.0, occluders=0,
+                 distractors=0, clutter=0, stereo=False, rgbd=False, baseline=0.1, focal_length=700, background_depth=6.0,
+                 floor_y=None, gap=0.5, seed=0):
+        """
+        Renders parabolic ball flights with exact ground truth.
+
+        The ball is thrown in front of a textured background and falls under
+        gravity projected into the image (9.81 m/s^2 * focal_length / depth).
+        With stereo=True a matching right image is rendered in which the ball
+        and the background are shifted by their true disparities. With
+        rgbd=True a registered uint16 depth image in 100 micrometer units is
+        rendered instead, as delivered by an Orbbec Astra.
+
+        Parameters:
+        - width, height: Resolution of the rendered frames (in pixels).
+        - fps: Frame rate of the simulated camera.
+        - flights: Number of throws, separated by `gap` seconds without a ball.
+        - speed: Factor applied to the randomly drawn launch velocities.
+        - depth: Distance of the ball from the camera at launch (in meters).
+        - depth_speed: Velocity of the ball away from the camera (in m/s).
+        - ball_radius: Radius of the ball (in meters).
+        - ball_color: BGR color of the ball (the default matches the detector's green range).
+        - noise: Standard deviation of the Gaussian pixel noise.
+        - lighting: Strength of the global flicker and the horizontal shading, in [0, 1).
+        - dimming: Fraction of the light lost per second, as in an arena slowly getting darker.
+        - occluders: Number of vertical bars in front of the flight path.
+        - distractors: Number of smaller ball-colored blobs moving in the background.
+        - clutter: Number of static ball-colored objects on the background,
+          larger than the ball; discs and boxes alternate.
+        - stereo: Also render the right image of a rectified stereo pair.
+        - rgbd: Also render the registered depth image.
+        - baseline: Distance between the stereo cameras (in meters).
+        - focal_length: Focal length of the cameras (in pixels).
+        - background_depth: Distance of the background plane (in meters).
+        - floor_y: Image row of the floor where a flight ends; defaults to 95% of the height.
+        - gap: Pause between flights (in seconds).
+        - seed: Seed of the random launch parameters, texture and noise.
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.flights = flights
+        self.speed = speed
+        self.depth = depth
+        self.depth_speed = depth_speed
+        self.ball_radius = ball_radius
+        self.ball_color = ball_color
+        self.noise = noise
+        self.lighting = lighting
+        self.dimming = dimming
+        if stereo and rgbd:
+            raise ValueError("A scene is either stereo or RGB-D.")
+        self.stereo = stereo
+        self.rgbd = rgbd
+        self.baseline = baseline
+        self.focal_length = focal_length
+        self.background_depth = background_depth
+        self.floor_y = floor_y if floor_y is not None else 0.95 * height
+        self.gap = gap
+        self.rng = np.random.default_rng(seed)
+
+        # Low-saturation texture: gives the block matcher something to match without looking like the ball
+        self.background_disparity = int(round(focal_length * baseline / background_depth)) if stereo else 0
+        texture = self.rng.integers(60, 200, (height // 8 + 1, (width + self.background_disparity) // 8 + 1))
+        texture = cv2.resize(texture.astype(np.uint8), (width + self.background_disparity, height),
+                             interpolation=cv2.INTER_CUBIC)
+        self.background = cv2.cvtColor(texture, cv2.COLOR_GRAY2BGR)
+        clutter_size = 1.5 * ball_radius * focal_length / depth
+        for index, (x, y) in enumerate(self.rng.uniform((0, 0), (width, height * 0.9), (clutter, 2))):
+            # Drawn on the background plane, so the right view sees it at the background disparity
+            if index % 2 == 0:
+                self._circle(self.background, x, y, clutter_size, ball_color)
+            else:
+                cv2.rectangle(self.background, (int(x - 2 * clutter_size), int(y - clutter_size / 2)),
+                              (int(x + 2 * clutter_size), int(y + clutter_size / 2)), ball_color, -1)
+        self.shading = (1.0 - lighting * np.linspace(0.0, 1.0, width, dtype=np.float32))[None, :, None]
+
+        bar_width = max(4, int(2.5 * ball_radius * focal_length / depth))
+        self.occluders = [(int(x), bar_width) for x in self.rng.uniform(0.3, 0.8, occluders) * width]
+        self.occluder_disparity = int(round(focal_length * baseline / (0.8 * depth))) if stereo else 0
+        self.distractors = [{"position": self.rng.uniform((0, 0), (width, height * 0.9)),
+                             "velocity": self.rng.normal(0, 60, 2),
+                             "radius": 0.6 * ball_radius * focal_length / depth} for _ in range(distractors)]
+        self.noise_buffer = np.empty((height, width, 3), np.int16)
+
+    def _launch(self):
+        # Thrown from the left third so that it lands inside the frame
+        gravity = GRAVITY * self.focal_length / self.depth
+        x0 = self.rng.uniform(0.05, 0.3) * self.width
+        y0 = self.rng.uniform(0.6, 0.8) * self.height
+        peak = self.rng.uniform(0.1, 0.35) * self.height
+        vy = -np.sqrt(2 * gravity * (y0 - peak)) * self.speed
+        flight_time = (-vy + np.sqrt(vy ** 2 + 2 * gravity * (self.floor_y - y0))) / gravity
+        vx = self.rng.uniform(0.3, 0.6) * self.width / flight_time
+        return x0, y0, vx, vy, gravity, flight_time
+
+    def frames(self):
+        """
+        Renders the scene frame by frame.
+
+        Yields:
+        - frame: The (left) BGR frame.
+        - second_frame: The right BGR frame of a stereo scene, the raw depth
+          image of an RGB-D scene, or None.
+        - truth: Dict with the simulation `time`, the `flight` index, the true
+          subpixel `position` (None between flights), the `visible` fraction of
+          the ball, its `radius` and `depth`, its stereo `disparity`, and the
+          `landing` (x, time to landing) where the flight reaches floor_y.
+        """
+        t = 0.0
+        dt = 1.0 / self.fps
+        for flight in range(self.flights):
+            x0, y0, vx, vy, gravity, flight_time = self._launch()
+            landing_x = float(x0 + vx * flight_time)
+            start = t
+            while t - start <= flight_time:
+                elapsed = t - start
+                position = (float(x0 + vx * elapsed), float(y0 + vy * elapsed + 0.5 * gravity * elapsed ** 2))
+                depth = self.depth + self.depth_speed * elapsed
+                truth = {"time": t, "flight": flight, "position": position, "depth": depth,
+                         "radius": self.ball_radius * self.focal_length / depth,
+                         "disparity": self.focal_length * self.baseline / depth,
+                         "landing": (landing_x, float(flight_time - elapsed))}
+                yield self._render(truth, t)
+                t += dt
+            gap_end = t + self.gap
+            while t < gap_end:
+                yield self._render({"time": t, "flight": flight, "position": None, "depth": None, "radius": None,
+                                    "disparity": None, "landing": None}, t)
+                t += dt
+
+    def _render(self, truth, t):
+        frame = self._render_view(truth, t, 0)
+        second_frame = None
+        if self.stereo:
+            second_frame = self._render_view(truth, t, 1)
+        elif self.rgbd:
+            second_frame = self._render_depth(truth)
+        truth["visible"] = self._visible_fraction(truth) if truth["position"] is not None else 0.0
+        return frame, second_frame, truth
+
+    def _render_view(self, truth, t, view):
+        # View 1 is the right camera: everything moves left by its disparity
+        shift = self.background_disparity * view
+        frame = self.background[:, shift:shift + self.width].copy()
+        dt = 1.0 / self.fps
+        for distractor in self.distractors:
+            if view == 0:
+                distractor["position"] += distractor["velocity"] * dt
+                distractor["position"] %= (self.width, self.height * 0.9)
+            x, y = distractor["position"]
+            self._circle(frame, x - shift, y, distractor["radius"], self.ball_color)
+        if truth["position"] is not None:
+            x, y = truth["position"]
+            self._circle(frame, x - truth["disparity"] * view, y, truth["radius"], self.ball_color)
+        for x, bar_width in self.occluders:
+            x -= self.occluder_disparity * view
+            cv2.rectangle(frame, (x, 0), (x + bar_width, self.height), (90, 90, 90), -1)
+
+        if self.lighting or self.dimming:
+            gain = (1.0 - self.dimming) ** t * (1.0 + 0.5 * self.lighting * np.sin(2 * np.pi * 0.5 * t))
+            frame = cv2.convertScaleAbs(frame.astype(np.float32) * (self.shading * gain))
+        if self.noise:
+            cv2.randn(self.noise_buffer, 0, self.noise)
+            frame = cv2.add(frame, self.noise_buffer, dtype=cv2.CV_8U)
+        return frame
+
+    def _render_depth(self, truth):
+        # Distractors lie on the background plane; the ball and the occluders are in front of it
+        depth = np.full((self.height, self.width), int(self.background_depth / DEPTH_UNIT), np.uint16)
+        if truth["position"] is not None:
+            x, y = truth["position"]
+            self._circle(depth, x, y, truth["radius"], int(truth["depth"] / DEPTH_UNIT))
+        for x, bar_width in self.occluders:
+            cv2.rectangle(depth, (x, 0), (x + bar_width, self.height), int(0.8 * self.depth / DEPTH_UNIT), -1)
+        return depth
+
+    @staticmethod
+    def _circle(frame, x, y, radius, color):
+        # 4 fractional bits keep the subpixel ball position exact
+        cv2.circle(frame, (int(round(x * 16)), int(round(y * 16))), int(round(radius * 16)), color, -1,
+                   cv2.LINE_AA, shift=4)
+
+    def _visible_fraction(self, truth):
+        x, y = truth["position"]
+        radius = truth["radius"]
+        x0, y0 = int(x - radius) - 1, int(y - radius) - 1
+        size = int(2 * radius) + 3
+        patch = np.zeros((size, size), np.uint8)
+        self._circle(patch, x - x0, y - y0, radius, 255)
+        ball_pixels = np.count_nonzero(patch)
+        for bar_x, bar_width in self.occluders:
+            patch[:, max(0, bar_x - x0):max(0, bar_x + bar_width + 1 - x0)] = 0
+        # Parts outside the frame are not visible either
+        patch[:, :max(0, -x0)] = 0
+        patch[:, max(0, self.width - x0):] = 0
+        patch[:max(0, -y0)] = 0
+        patch[max(0, self.height - y0):] = 0
+        return np.count_nonzero(patch) / ball_pixels if ball_pixels else 0.0
+
+
+class SyntheticSource(FrameSource):
+    def __init__(self, scene, realtime=False):
+        """
+        Plays a SyntheticScene through the FrameSource interface, e.g. into
+        CameraFeed(capture=...). The right frame of a stereo scene is in
+        paired_frames["right"], the depth image of an RGB-D scene in
+        paired_frames["depth"], and the ground truth of the last frame in `truth`.
+
+        Parameters:
+        - scene: The SyntheticScene to play.
+        - realtime: If True, frames are released at the scene frame rate.
+        """
+        super().__init__()
+        self.frames = scene.frames()
+        self.rgbd = scene.rgbd
+        self.realtime = realtime
+        self.start_time = None
+        self.truth = None
+
+    def read_timestamped(self):
+        try:
+            frame, second_frame, self.truth = next(self.frames)
+        except StopIteration:
+            self.ended = True
+            return False, None, None
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        timestamp = self.start_time + self.truth["time"]
+        if self.realtime:
+            delay = timestamp - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.paired_frames = {}
+        if second_frame is not None:
+            self.paired_frames = {"depth" if self.rgbd else "right": second_frame}
+        return True, frame, timestamp
@@ -0,0 +1,141 @@
+import atexit
+import json
+import os
+import threading
+import numpy as np
+
+
+class TelemetrySink:
+    def __init__(self, path, fields, format="csv", flush_size=256, flush_interval=1.0, header=True,
+                 delimiter=",", float_format=""):
+        """
+        Buffers numeric records in memory and appends them to a file from a
+        background thread, so the frame loop never touches the file system.
+
+        Records are flushed once flush_size of them are pending or every
+        flush_interval seconds, and always on close(). close() is also
+        registered with atexit, so an interrupted run keeps its data.
+
+        Parameters:
+        - path: Output file, opened once in append mode. A binary file is only
+          appended to if its `<path>.json` describes the same fields;
+          otherwise a ValueError is raised and the file is left untouched.
+        - fields: Names of the values of each record.
+        - format: "csv" for text, or "binary" for little-endian float64
+          records; np.fromfile with the dtype from `<path>.json` (or
+          TelemetrySink.load) returns them with one column per field.
+        - flush_size: Number of pending records that triggers a flush.
+        - flush_interval: Maximum time a record stays in memory (in seconds).
+        - header: Write the field names as the first line of a new CSV file.
+        - delimiter: CSV column separator.
+        - float_format: Format specification of the CSV values; the default
+          writes the shortest text that reads back to the exact value.
+        """
+        if format not in ("csv", "binary"):
+            raise ValueError("Format must be 'csv' or 'binary'.")
+        self.path = path
+        self.fields = list(fields)
+        self.format = format
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.delimiter = delimiter
+        self.float_format = float_format
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if format == "csv":
+            self.file = open(path, "a")
+            if header and new_file:
+                self.file.write(delimiter.join(self.fields) + "\n")
+        else:
+            meta = {"fields": self.fields, "dtype": "<f8"}
+            if new_file:
+                with open(path + ".json", "w") as file:
+                    json.dump(meta, file)
+            else:
+                self._check_sidecar(meta)
+            self.file = open(path, "ab")
+
+        self.pending = []
+        self.records_written = 0
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="TelemetrySink", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _check_sidecar(self, meta):
+        # Appending records of another layout would make the whole file unreadable
+        try:
+            with open(self.path + ".json") as file:
+                existing = json.load(file)
+        except (OSError, ValueError):
+            raise ValueError(f"Cannot append to {self.path}: its {self.path}.json is missing or unreadable.")
+        if existing != meta:
+            raise ValueError(f"Cannot append to {self.path}: it holds fields {existing.get('fields')} "
+                             f"({existing.get('dtype')}), not {meta['fields']} ({meta['dtype']}).")
+        if os.path.getsize(self.path) % (8 * len(self.fields)):
+            raise ValueError(f"Cannot append to {self.path}: it ends with a partial record.")
+
+    def write(self, *values):
+        """
+        Queues one record with a value per field. Only appends to a list.
+        """
+        if len(values) != len(self.fields):
+            raise ValueError(f"Expected {len(self.fields)} values, got {len(values)}.")
+        with self.condition:
+            self.pending.append(values)
+            if len(self.pending) >= self.flush_size:
+                self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.running and len(self.pending) < self.flush_size:
+                    self.condition.wait(self.flush_interval)
+                records, self.pending = self.pending, []
+                running = self.running
+            self._write(records)
+            if not running:
+                break
+
+    def _write(self, records):
+        if not records:
+            return
+        if self.format == "csv":
+            fmt = self.float_format
+            self.file.write("".join(self.delimiter.join(format(value, fmt) for value in record) + "\n"
+                                    for record in records))
+        else:
+            np.array(records, dtype=np.float64).tofile(self.file)
+        self.file.flush()
+        self.records_written += len(records)
+
+    def close(self):
+        """
+        Writes all pending records and closes the file. Safe to call twice.
+        """
+        with self.condition:
+            if not self.running:
+                return
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.file.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    @staticmethod
+    def load(path):
+        """
+        Reads a binary telemetry file back as a structured array (one field per column).
+        """
+        with open(path + ".json") as file:
+            meta = json.load(file)
+        dtype = np.dtype([(field, meta["dtype"]) for field in meta["fields"]])
+        return np.fromfile(path, dtype=dtype)
@@ -1,94 +1,296 @@
+import argparse
+import os
 import time
 import cv2
 from camera_feed import CameraFeed
 from ball_detection import BallDetector
+from motion_filter import MotionFilter
+from color_tuner import ColorTuner
 from motion_tracking import MotionTracker
 from trajectory_prediction import TrajectoryPredictor
+from trajectory_3d import CameraModel, Trajectory3DPredictor
+from single_camera_distance import SingleCameraDistanceEstimator
 from visualization import Visualizer
 from depth_map import DepthMap
+from depth_source import OrbbecDepthSource
+from camera_group import CameraGroup
+from calibration import StereoCalibration
+from display import Display
+from instrumentation import Instrumentation
+from frame_source import CameraSource, EndOfStream, OrbbecSource, FrameRecorder, Recording, RecordingSource
+from trajectory_buffer import TrajectoryBuffer
+from telemetry import TelemetrySink
+from landing_publisher import LandingPublisher
 
+parser = argparse.ArgumentParser()
+parser.add_argument("--headless", action="store_true", help="No window and no drawing (on the robot)")
+parser.add_argument("--instrument", action="store_true", help="Record per-stage timings to timings.json")
+parser.add_argument("--profile", action="store_true", help="Also run cProfile over frames 300-399 (profile.prof)")
+parser.add_argument("--record", metavar="DIR", help="Record the raw camera frames into DIR")
+parser.add_argument("--replay", metavar="DIR", help="Replay a recording instead of opening the cameras")
+parser.add_argument("--fast", action="store_true", help="Replay as fast as possible, without dropping frames")
+parser.add_argument("--log-landings", metavar="FILE", help="Log landing predictions (.csv, or binary otherwise)")
+parser.add_argument("--rgbd", action="store_true", help="Use the Orbbec color and depth streams instead of stereo")
+parser.add_argument("--motion-filter", action="store_true", help="Only detect moving ball-colored blobs")
+parser.add_argument("--shape-filter", action="store_true",
+                    help="Pick the roundest blob (circularity and inertia limits tuned for 1200x720)")
+parser.add_argument("--auto-color", action="store_true",
+                    help="Retune the ball color range to the lighting on a background thread")
+parser.add_argument("--pyramid", type=int, default=0, metavar="LEVELS",
+                    help="Search full frames at 1/2^LEVELS resolution, then refine at full resolution")
+parser.add_argument("--depth-engine", choices=["bm", "sgbm", "tiled_sgbm"], default="bm",
+                    help="Stereo matcher (tiled_sgbm matches strips in parallel processes)")
+parser.add_argument("--depth-map", action=argparse.BooleanOptionalAction, default=None,
+                    help="Compute the dense depth map and show it in its own window (default: on unless headless)")
+parser.add_argument("--incremental-depth", action="store_true",
+                    help="Recompute only the changed tiles of the dense depth map (see --depth-map)")
+parser.add_argument("--3d", dest="world", action="store_true", help="Predict the landing point on the floor in meters")
+parser.add_argument("--publish", metavar="HOST:PORT", help="Send landing predictions to the robot controller (OSC over UDP)")
 
-# Initialize components
-camera = CameraFeed(width=1200, height=720)
-detector = BallDetector(lower_color_range=[40, 70, 70], upper_color_range=[80, 255, 255])
-tracker = MotionTracker()
-predictor = TrajectoryPredictor()
-visualizer = Visualizer()
-depth_estimator = DepthMap(baseline=0.1, focal_length=700)
-
-# Initialize runtime variables
-trail_points = []
-predicted_trail_points = []
-prev_time = time.time()
-
-# Placeholder for stereo camera setup
-left_camera = CameraFeed(width=1200, height=720)  # Left camera feed
-right_camera = CameraFeed(width=1200, height=720)  # Right camera feed
-
-try:
-    while True:
-        # Step 1: Capture frames from cameras
-        frame = camera.get_frame()
-        left_frame = left_camera.get_frame()
-        right_frame = right_camera.get_frame()
-
-        # Step 2: Detect the ball in the frame
-        center, bounding_box = detector.detect_ball(frame)
-
-        # Step 3: Kalman Filter prediction and correction
-        predicted_center = tracker.predict()
-        if center:
-            tracker.correct(center)
-            trail_points.append(center)
-        predicted_trail_points.append(predicted_center)
-
-        # Step 4: Update trajectory predictor
-        if center:
-            predictor.update_positions(center)
-
-        predicted_landing = predictor.predict_landing(floor_y=720)  # Assuming the floor is at y=720
-
-        # Step 5: Compute and visualize depth map
-        depth_map = depth_estimator.compute_depth_map(left_frame, right_frame)
-        if center:
-            distance = depth_estimator.estimate_distance(depth_map, center)
-            cv2.putText(frame, f"Distance: {distance:.2f} m", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        depth_estimator.visualize_depth_map(depth_map, window_name="Depth Map")
-
-        # Step 6: Visualize real-time and predicted trajectories
-        visualizer.draw_ball_info(frame, center, bounding_box)
-        visualizer.draw_trajectory(frame, trail_points, color=(255, 0, 0))  # Blue for real trajectory
-        visualizer.draw_trajectory(frame, predicted_trail_points, color=(0, 255, 255))  # Yellow for predicted trajectory
-
-        # Step 7: Display metrics (FPS, MSE, Accuracy)
-        current_time = time.time()
-        fps = 1 / (current_time - prev_time)
-        prev_time = current_time
-        mse = None
-        accuracy = None
-        if len(trail_points) > 5 and len(predicted_trail_points) > 5:
-            real_points = trail_points[-5:]
-            pred_points = predicted_trail_points[-5:]
-            mse = sum(((r[0] - p[0]) ** 2 + (r[1] - p[1]) ** 2) for r, p in zip(real_points, pred_points)) / len(real_points)
-            accuracy = sum(1 for r, p in zip(real_points, pred_points) if abs(r[0] - p[0]) <= 10 and abs(r[1] - p[1]) <= 10) / len(real_points) * 100
-        visualizer.display_metrics(frame, fps, mse, accuracy)
-
-        # Step 8: Show the main camera feed with annotations
-        camera.show_frame(frame, window_name="Ball Tracking System")
-
-        # Step 9: Exit on key press
-        if camera.exit_requested():
-            break
-
-        # Maintain trail point size
-        trail_points = trail_points[-50:]  # Keep the last 50 points for clarity
-        predicted_trail_points = predicted_trail_points[-50:]
-
-except Exception as e:
-    print(f"An error occurred: {e}")
-finally:
-    # Release all resources
-    camera.release()
-    left_camera.release()
-    right_camera.release()
-    camera.close_windows()
+# Written by calibration.py; without it the cameras are assumed to be rectified
+calibration_file = "stereo_calibration.npz"
+# Pose of the camera above the floor, for the 3D landing prediction
+camera_height = 1.0  # meters
+camera_pitch = 0.0  # degrees, downward
+
+
+def main():
+    # Worker processes (tiled_sgbm) re-import this module under the spawn start method
+    # (Windows, macOS), so nothing may run at import time
+    args = parser.parse_args()
+
+    headless = args.headless
+    instrumentation = Instrumentation(enabled=args.instrument or args.profile,
+                                      profile_start=300 if args.profile else None)
+    # The dense depth map is computed for its window (only on displayed frames), or on
+    # every frame when explicitly requested in headless mode; otherwise the ball box is queried
+    show_depth_map = args.depth_map if args.depth_map is not None else not headless
+    if args.incremental_depth and (args.rgbd or not show_depth_map):
+        parser.error("--incremental-depth applies to the stereo dense depth map; use it with --depth-map")
+
+    recording = Recording(args.replay) if args.replay else None
+    recorder = FrameRecorder(args.record) if args.record else None
+    landing_log = None
+    if args.log_landings:
+        fields = ["time", "landing_x", "landing_y", "landing_std", "time_to_landing"] if args.world else \
+            ["time", "landing_x", "landing_std", "time_to_landing"]
+        landing_log = TelemetrySink(args.log_landings, fields,
+                                    format="csv" if args.log_landings.endswith(".csv") else "binary")
+
+    def open_feed(stream, buffer_size=2, paired=()):
+        # A live camera (recorded if requested) or one stream of the replayed recording.
+        # Paired frames belong to the last read, so a feed with paired streams is read synchronously.
+        if recording is not None:
+            return CameraFeed(capture=recording.source(stream, realtime=not args.fast, paired=paired),
+                              threaded=not args.fast and not paired, buffer_size=buffer_size)
+        source = OrbbecSource() if args.rgbd else CameraSource(0, width=1200, height=720)
+        if recorder is not None:
+            source = RecordingSource(source, recorder, stream)
+        return CameraFeed(capture=source, threaded=not paired, buffer_size=buffer_size)
+
+    # Initialize components
+    camera = open_feed("color", paired=("depth",)) if args.rgbd else open_feed("main")
+    publisher = None
+    if args.publish:
+        host, port = args.publish.rsplit(":", 1)
+        # Latency is measured on the clock of the capture timestamps (the replay clock of a recording)
+        publisher = LandingPublisher(host, int(port), clock=camera.now)
+    # Same shape limits as the Orbbec notebook (minCircularity = 0.5). They reject the small, blocky
+    # blobs of a ball at lower resolutions, so shape scoring is opt-in
+    shape = {"min_circularity": 0.5, "min_inertia": 0.5} if args.shape_filter else {}
+    detector = BallDetector(lower_color_range=[40, 70, 70], upper_color_range=[80, 255, 255],
+                            motion_filter=MotionFilter() if args.motion_filter else None,
+                            pyramid_levels=args.pyramid, **shape)
+    color_tuner = ColorTuner(detector).start() if args.auto_color else None  # Samples confirmed detections
+    tracker = MotionTracker(backend="numpy")  # Constant-acceleration model driven by capture timestamps
+    predictor = TrajectoryPredictor(max_misses=detector.max_misses)  # Flights end when the detector loses the ball
+    visualizer = Visualizer()
+    display = Display(rate=15, headless=headless).start()  # Renders on its own thread
+    calibration = None
+    if args.rgbd:
+        depth_estimator = OrbbecDepthSource()  # Registered depth from the sensor, no stereo matching
+    elif os.path.exists(calibration_file):
+        calibration = StereoCalibration.load(calibration_file)
+        calibration.init_rectification()  # Remap tables are built once, not per frame
+        depth_estimator = DepthMap(calibration=calibration, engine=args.depth_engine,
+                                   incremental=args.incremental_depth)
+    else:
+        depth_estimator = DepthMap(baseline=0.1, focal_length=700, engine=args.depth_engine,
+                                   incremental=args.incremental_depth)
+    predictor_3d = None
+    landing_3d = None
+    if args.world:
+        if calibration is not None:
+            camera_model = CameraModel(calibration=calibration, height=camera_height, pitch=camera_pitch)
+        elif args.rgbd:
+            camera_model = CameraModel(570, (320, 240), camera_height, camera_pitch)  # Nominal Astra color intrinsics
+        else:
+            camera_model = CameraModel(700, (600, 360), camera_height, camera_pitch)
+        predictor_3d = Trajectory3DPredictor(camera_model)
+        # Distance from the apparent ball size when there is no depth for a detection
+        if calibration is not None:
+            size_estimator = SingleCameraDistanceEstimator(known_width=0.2, calibration=calibration)
+        else:
+            size_estimator = SingleCameraDistanceEstimator(known_width=0.2, focal_length=camera_model.focal_length)
+
+    # Initialize runtime variables
+    trail_points = TrajectoryBuffer(capacity=50)  # Keep the last 50 points for clarity
+    predicted_trail_points = TrajectoryBuffer(capacity=50)
+    prev_time = time.perf_counter()
+    prev_capture_time = None
+
+    # Placeholder for stereo camera setup
+    if args.rgbd:
+        stereo_cameras = None
+    elif recording is not None and args.fast:
+        # Pairs are looked up by capture time, so every replayed frame gets the same stereo pair
+        stereo_cameras = None
+    else:
+        left_camera = open_feed("left", buffer_size=4)  # Left camera feed
+        right_camera = open_feed("right", buffer_size=4)  # Right camera feed
+        stereo_cameras = CameraGroup([left_camera, right_camera], tolerance=0.010, policy="reject")
+
+    try:
+        while True:
+            # Step 1: Capture frames from cameras
+            with instrumentation.span("capture"):
+                frame = camera.get_frame()
+                if args.rgbd:
+                    depth_frame = camera.cap.paired_frames.get("depth")
+                    stereo_frames = (frame, depth_frame) if depth_frame is not None else None
+                elif stereo_cameras is not None:
+                    stereo_frames = stereo_cameras.get_frames()  # None if the pair is out of sync
+                else:
+                    stereo_frames = [recording.nearest(stream, camera.last_timestamp, tolerance=0.010)
+                                     for stream in ("left", "right")]
+                    if any(stereo_frame is None for stereo_frame in stereo_frames):
+                        stereo_frames = None
+
+            # Step 2: Detect the ball in a window around the Kalman prediction
+            dt = camera.last_timestamp - prev_capture_time if prev_capture_time is not None else None
+            prev_capture_time = camera.last_timestamp
+            with instrumentation.span("predict"):
+                predicted_center = tracker.predict(dt)
+            with instrumentation.span("detect_ball"):
+                center, bounding_box = detector.detect_ball_tracked(frame, predicted_center, tracker.position_covariance())
+
+            # Step 3: Kalman Filter correction
+            if center:
+                with instrumentation.span("correct"):
+                    tracker.correct(center)
+                trail_points.append(center, camera.last_timestamp)
+                if color_tuner is not None:
+                    color_tuner.observe(frame, bounding_box)  # Copies a small patch; the tuning runs on its thread
+            predicted_trail_points.append(predicted_center, camera.last_timestamp)
+
+            # Step 4: Update trajectory predictor
+            with instrumentation.span("predict_landing"):
+                if center:
+                    predictor.update_positions(center, camera.last_timestamp)
+                elif predictor.miss() and predictor_3d is not None:
+                    predictor_3d.reset()  # The flight is over; do not fit the next one together with it
+
+                landing = predictor.estimate_landing(floor_y=720)  # Assuming the floor is at y=720
+                predicted_landing = int(landing[0]) if landing else None
+                # Only new samples give a new prediction; it is stamped with their capture time
+                new_landing = landing and center and predictor_3d is None
+                if new_landing and publisher is not None:
+                    publisher.publish(*landing, capture_time=camera.last_timestamp)  # Returns immediately
+                if new_landing and landing_log is not None:
+                    landing_x, landing_std, time_to_landing = landing
+                    landing_log.write(camera.last_timestamp, landing_x,
+                                      landing_std if landing_std is not None else float("nan"), time_to_landing)
+
+            # Only frames the display thread will actually show are annotated
+            render = display.wants_frame()
+
+            # Step 5: Estimate the ball distance, from the dense depth map when it is enabled
+            distance = None
+            if stereo_frames is not None:
+                left_frame, right_frame = stereo_frames
+                if show_depth_map and (render or headless):
+                    with instrumentation.span("compute_depth_map"):
+                        depth_map = depth_estimator.compute_depth_map(left_frame, right_frame)
+                    distance = depth_estimator.estimate_distance(depth_map, center) if center else None
+                    if render:
+                        display.publish("Depth Map", depth_estimator.colorize_depth_map(depth_map))
+                elif bounding_box:
+                    with instrumentation.span("estimate_depth_in_box"):
+                        distance, _ = depth_estimator.estimate_depth_in_box(left_frame, right_frame, bounding_box)
+
+            # Step 5b: Metric landing point from the back-projected detections
+            if predictor_3d is not None:
+                with instrumentation.span("predict_landing_3d"):
+                    if center and distance is None:
+                        distance = size_estimator.estimate_distance(bounding_box[2])
+                    updated = center and distance is not None
+                    if updated:
+                        predictor_3d.update_positions(center, distance, camera.last_timestamp)
+                    landing_3d = predictor_3d.estimate_landing()
+                    if landing_3d and updated and publisher is not None:
+                        landing_x, landing_y, landing_std, time_to_landing = landing_3d
+                        publisher.publish(landing_x, landing_std, time_to_landing, capture_time=camera.last_timestamp,
+                                          landing_y=landing_y)
+                    if landing_3d and updated and landing_log is not None:
+                        landing_log.write(camera.last_timestamp, *landing_3d)
+
+            current_time = time.perf_counter()
+            # The rolling mean frame time is far steadier than a single frame interval
+            fps = instrumentation.fps() or 1 / (current_time - prev_time)
+            prev_time = current_time
+
+            if render:
+                if distance is not None:
+                    cv2.putText(frame, f"Distance: {distance:.2f} m", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+
+                with instrumentation.span("draw"):
+                    # Step 6: Visualize real-time and predicted trajectories
+                    visualizer.draw_ball_info(frame, center, bounding_box)
+                    visualizer.draw_trajectory(frame, trail_points, color=(255, 0, 0))  # Blue for real trajectory
+                    visualizer.draw_trajectory(frame, predicted_trail_points, color=(0, 255, 255))  # Yellow for predicted trajectory
+                    if landing_3d:
+                        landing_x, landing_y, _, time_to_landing = landing_3d
+                        visualizer.draw_landing(frame, camera_model.world_to_pixel((landing_x, landing_y, 0.0)),
+                                                f"Landing: ({landing_x:.2f}, {landing_y:.2f}) m in {time_to_landing:.2f} s")
+
+                    # Step 7: Display metrics (FPS, MSE, Accuracy)
+                    mse, accuracy = visualizer.compute_metrics(trail_points, predicted_trail_points)
+                    visualizer.display_metrics(frame, fps, mse, accuracy)
+
+                # Step 8: Hand the annotated frame to the display thread
+                display.publish("Ball Tracking System", frame)
+
+            # Step 9: Exit on key press (in the display window) or Ctrl+C
+            if display.exit_requested():
+                break
+
+            instrumentation.frame()
+
+    except EndOfStream:
+        print("End of stream")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        # Release all resources
+        display.stop()
+        if color_tuner is not None:
+            color_tuner.stop()
+            print(f"Color tuning: {color_tuner.stats()}")
+        camera.release()
+        if stereo_cameras is not None:
+            stereo_cameras.release()
+        if args.incremental_depth:
+            print(f"Incremental depth: {depth_estimator.incremental_stats()}")
+        depth_estimator.close()
+        if recorder is not None:
+            recorder.close()
+        if landing_log is not None:
+            landing_log.close()
+        if publisher is not None:
+            print(f"Capture to publish latency: {publisher.latency_stats()}")
+            publisher.close()
+        instrumentation.close(export_path="timings.json")
+
+
+if __name__ == "__main__":
+    main()
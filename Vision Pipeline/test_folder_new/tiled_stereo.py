@@ -0,0 +1,193 @@
+import atexit
+import multiprocessing
+import os
+from multiprocessing import resource_tracker, shared_memory
+import cv2
+import numpy as np
+
+
+def create_matcher(algorithm, num_disparities, block_size):
+    """
+    Creates an OpenCV stereo matcher.
+
+    Parameters:
+    - algorithm: "bm" for StereoBM, or "sgbm" for semi-global matching
+      (StereoSGBM, with the usual smoothness penalties for the block size).
+    - num_disparities: Disparity search range (multiple of 16).
+    - block_size: Matching block size (odd).
+    """
+    if algorithm == "bm":
+        return cv2.StereoBM_create(numDisparities=num_disparities, blockSize=block_size)
+    if algorithm == "sgbm":
+        return cv2.StereoSGBM_create(minDisparity=0, numDisparities=num_disparities, blockSize=block_size,
+                                     P1=8 * block_size * block_size, P2=32 * block_size * block_size,
+                                     disp12MaxDiff=1, uniquenessRatio=10, speckleWindowSize=100, speckleRange=2)
+    raise ValueError("Algorithm must be 'bm' or 'sgbm'.")
+
+
+def _strip_worker(connection, algorithm, num_disparities, block_size):
+    # Runs inside a child process; the matcher is created once and the frame
+    # buffers are attached again only when the parent reallocates them. The
+    # parent creates and unlinks the buffers.
+    cv2.setNumThreads(1)
+    matcher = create_matcher(algorithm, num_disparities, block_size)
+    names, memories, arrays = None, [], None
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        task_names, shape, first, last, core_first, core_last = task
+        if task_names != names:
+            arrays = None
+            for memory in memories:
+                memory.close()
+            memories = [shared_memory.SharedMemory(name=name) for name in task_names]
+            arrays = [np.ndarray(shape, np.uint8, memories[0].buf), np.ndarray(shape, np.uint8, memories[1].buf),
+                      np.ndarray(shape, np.int16, memories[2].buf)]
+            names = task_names
+        left, right, output = arrays
+        disparity = matcher.compute(left[first:last], right[first:last])
+        output[core_first:core_last] = disparity[core_first - first:core_last - first]
+        connection.send(True)
+    arrays = None
+    for memory in memories:
+        memory.close()
+    connection.close()
+
+
+class TiledStereoMatcher:
+    def __init__(self, algorithm="sgbm", num_disparities=16 * 5, block_size=5, workers=None, min_strip_rows=64):
+        """
+        Stereo matcher that splits a rectified pair into horizontal strips and
+        matches them in parallel on a persistent pool of worker processes.
+
+        The grayscale pair and the disparity map live in shared memory, so a
+        frame costs one copy in and one copy out; only row ranges go through
+        the pipes. Neighbouring strips overlap by block_size rows, so the
+        matching blocks of the rows near a seam see the same pixels as in a
+        full-frame match. SGBM itself is only approximated: its vertical and
+        diagonal cost paths stop at the strip edge instead of running through
+        the whole image, so a few pixels near the seams can differ (on the
+        synthetic scene of benchmark_stereo_engines.py, 4 strips agreed with full-frame
+        SGBM on 99.89% of the pixels; BM, which has no paths, is exact). Each
+        strip keeps only its own rows, so the stitched map has no seams to blend.
+
+        compute() has the signature of the OpenCV matchers, so DepthMap uses it
+        in their place. Under the spawn start method (Windows, macOS) the
+        workers re-import the main script, so it must create the matcher
+        under an `if __name__ == "__main__":` guard.
+
+        Parameters:
+        - algorithm: "sgbm" or "bm" (see create_matcher).
+        - num_disparities: Disparity search range (multiple of 16).
+        - block_size: Matching block size (odd); also the strip overlap.
+        - workers: Number of worker processes (and strips); defaults to the CPU count.
+        - min_strip_rows: Inputs too small to give every worker this many rows
+          (e.g. the band of a bounding box) are matched in this process.
+        """
+        self.algorithm = algorithm
+        self.num_disparities = num_disparities
+        self.block_size = block_size
+        self.overlap = block_size
+        self.workers = workers or os.cpu_count() or 1
+        self.min_strip_rows = min_strip_rows
+        self.local_matcher = create_matcher(algorithm, num_disparities, block_size)
+
+        # Workers must share the resource tracker of this process; one of their
+        # own would unlink the shared buffers when the worker exits
+        resource_tracker.ensure_running()
+        self.connections = []
+        self.processes = []
+        for index in range(self.workers):
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_strip_worker,
+                                              args=(child_connection, algorithm, num_disparities, block_size),
+                                              name=f"StereoStrip-{index}", daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        self.shape = None
+        self.memories = []
+        self.arrays = None
+        self.running = True
+        atexit.register(self.close)
+
+    def _allocate(self, shape):
+        # Shared buffers follow the frame size; workers re-attach on the next task
+        self._free()
+        sizes = (shape[0] * shape[1], shape[0] * shape[1], shape[0] * shape[1] * 2)
+        self.memories = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        self.arrays = [np.ndarray(shape, np.uint8, self.memories[0].buf),
+                       np.ndarray(shape, np.uint8, self.memories[1].buf),
+                       np.ndarray(shape, np.int16, self.memories[2].buf)]
+        self.shape = shape
+
+    def _free(self):
+        self.arrays = None
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories = []
+        self.shape = None
+
+    def strips(self, height):
+        """
+        Returns the (first, last, core_first, core_last) rows of every strip:
+        rows first:last are matched and rows core_first:core_last are kept.
+        """
+        bounds = np.linspace(0, height, self.workers + 1).astype(int)
+        return [(max(0, core_first - self.overlap), min(height, core_last + self.overlap), core_first, core_last)
+                for core_first, core_last in zip(bounds[:-1], bounds[1:])]
+
+    def compute(self, left, right, disparity=None):
+        """
+        Computes fixed-point (x16) disparities of a grayscale rectified pair.
+
+        Parameters:
+        - left, right: uint8 grayscale images.
+        - disparity: Optional int16 output array.
+
+        Returns:
+        - disparity: The disparity map.
+        """
+        if not self.running:
+            raise Exception("The matcher has been closed.")
+        shape = left.shape[:2]
+        if shape[0] < self.workers * self.min_strip_rows:
+            return self.local_matcher.compute(left, right, disparity=disparity)
+        if shape != self.shape:
+            self._allocate(shape)
+        shared_left, shared_right, shared_disparity = self.arrays
+        np.copyto(shared_left, left)
+        np.copyto(shared_right, right)
+
+        names = tuple(memory.name for memory in self.memories)
+        for connection, strip in zip(self.connections, self.strips(shape[0])):
+            connection.send((names, shape) + strip)
+        for connection in self.connections:
+            connection.recv()
+
+        if disparity is None:
+            return shared_disparity.copy()
+        np.copyto(disparity, shared_disparity)
+        return disparity
+
+    def close(self):
+        """
+        Stops the workers and frees the shared buffers. Safe to call twice.
+        """
+        if not self.running:
+            return
+        self.running = False
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except OSError:  # Worker already gone
+                pass
+        for process in self.processes:
+            process.join(timeout=1.0)
+        for connection in self.connections:
+            connection.close()
+        self._free()
+        atexit.unregister(self.close)
@@ -0,0 +1,177 @@
+import math
+import cv2
+import numpy as np
+from trajectory_prediction import first_crossing
+
+GRAVITY = 9.81  # m/s^2
+
+
+class CameraModel:
+    def __init__(self, focal_length=700, principal_point=(600, 360), height=1.0, pitch=0.0, calibration=None):
+        """
+        Pinhole camera with its pose above the floor.
+
+        Camera coordinates are x right, y down, z forward (OpenCV). World
+        coordinates are x right, y forward along the floor and z up, with the
+        origin on the floor below the camera.
+
+        Parameters:
+        - focal_length: Focal length (in pixels).
+        - principal_point: Image (cx, cy) of the optical axis (in pixels).
+        - height: Height of the camera above the floor (in meters).
+        - pitch: Downward tilt of the camera (in degrees).
+        - calibration: Optional StereoCalibration whose unrectified left camera
+          matrix and distortion are used instead, as detections come from the
+          raw frames. Pixels are undistorted before they are back-projected
+          and points are distorted when they are projected.
+        """
+        self.camera_matrix = None
+        self.dist_coeffs = None
+        if calibration is not None:
+            self.camera_matrix = calibration.camera_matrix_left
+            self.dist_coeffs = calibration.dist_coeffs_left
+            focal_length = self.camera_matrix[0, 0]
+            principal_point = self.camera_matrix[:2, 2]
+        self.focal_length = float(focal_length)
+        self.cx, self.cy = float(principal_point[0]), float(principal_point[1])
+        self.height = height
+        theta = math.radians(pitch)
+        # Columns are the camera x, y and z axes in world coordinates
+        self.rotation = np.array([[1.0, 0.0, 0.0],
+                                  [0.0, -math.sin(theta), math.cos(theta)],
+                                  [0.0, -math.cos(theta), -math.sin(theta)]])
+        self.position = np.array([0.0, 0.0, height])
+
+    def back_project(self, pixel, depth):
+        """
+        Returns the camera-frame point of a pixel at the given depth (along the optical axis, in meters).
+        """
+        if self.camera_matrix is not None:
+            # Normalized coordinates (x/z, y/z) of the undistorted pixel
+            x, y = cv2.undistortPoints(np.array([[pixel]], np.float64), self.camera_matrix, self.dist_coeffs)[0, 0]
+        else:
+            x = (pixel[0] - self.cx) / self.focal_length
+            y = (pixel[1] - self.cy) / self.focal_length
+        return np.array([x * depth, y * depth, depth])
+
+    def pixel_to_world(self, pixel, depth):
+        """
+        Returns the world point (in meters) of a pixel at the given depth.
+        """
+        return self.rotation @ self.back_project(pixel, depth) + self.position
+
+    def world_to_pixel(self, point):
+        """
+        Projects a world point into the image.
+
+        Returns:
+        - (x, y) pixel as floats, or None if the point is behind the camera.
+        """
+        camera_point = self.rotation.T @ (np.asarray(point, dtype=np.float64) - self.position)
+        x, y, z = camera_point
+        if z <= 0:
+            return None
+        if self.camera_matrix is not None:
+            pixel, _ = cv2.projectPoints(camera_point[None], np.zeros(3), np.zeros(3), self.camera_matrix, self.dist_coeffs)
+            return float(pixel[0, 0, 0]), float(pixel[0, 0, 1])
+        return float(self.cx + self.focal_length * x / z), float(self.cy + self.focal_length * y / z)
+
+
+class Trajectory3DPredictor:
+    def __init__(self, camera, window=10, gravity=GRAVITY, floor_height=0.0):
+        """
+        Predicts where and when the ball reaches the floor in world coordinates.
+
+        Each detection is back-projected with its depth, and the last `window`
+        world positions are fitted with a ballistic model whose acceleration is
+        fixed to gravity: x(t) and y(t) are lines and z(t) is a parabola with
+        known curvature, so every axis is a two-parameter least squares fit.
+        Because gravity is not estimated, a few samples early in the flight
+        already give a metric landing point.
+
+        Parameters:
+        - camera: CameraModel of the camera the detections come from.
+        - window: Number of most recent positions used for the fit.
+        - gravity: Gravitational acceleration (in m/s^2).
+        - floor_height: World height of the floor plane (in meters).
+        """
+        if window < 3:
+            raise ValueError("Window must hold at least 3 positions.")
+        self.camera = camera
+        self.window = window
+        self.gravity = gravity
+        self.floor_height = floor_height
+        self.points = np.zeros((window, 3))
+        self.timestamps = np.zeros(window)
+        self.count = 0
+        self.next_index = 0
+
+    def update_positions(self, pixel, depth, timestamp):
+        """
+        Adds a detection to the sliding window.
+
+        Parameters:
+        - pixel: The detected (x, y) center (in pixels).
+        - depth: Its distance along the optical axis (in meters).
+        - timestamp: Capture time (in seconds).
+        """
+        self.points[self.next_index] = self.camera.pixel_to_world(pixel, depth)
+        self.timestamps[self.next_index] = timestamp
+        self.next_index = (self.next_index + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+
+    def reset(self):
+        self.count = 0
+        self.next_index = 0
+
+    def fit(self):
+        """
+        Fits the ballistic model to the window.
+
+        Returns:
+        - (position, velocity, inverse_normal, residual_variances) at the time
+          of the newest position, or None with too few or repeated timestamps.
+        """
+        if self.count < 3:
+            return None
+        newest = (self.next_index - 1) % self.window
+        t = self.timestamps[:self.count] - self.timestamps[newest]
+        points = self.points[:self.count].copy()
+        points[:, 2] += 0.5 * self.gravity * t * t  # Remove the known gravity term from z
+        t_sum, tt_sum = float(t.sum()), float(t @ t)
+        determinant = self.count * tt_sum - t_sum * t_sum
+        if determinant <= 1e-12:
+            return None
+        inverse_normal = np.array([[tt_sum, -t_sum], [-t_sum, self.count]]) / determinant
+        position, velocity = inverse_normal @ np.array([points.sum(axis=0), t @ points])
+        residuals = points - position - np.outer(t, velocity)
+        residual_variances = np.sum(residuals * residuals, axis=0) / (self.count - 2)
+        return position, velocity, inverse_normal, residual_variances
+
+    def estimate_landing(self):
+        """
+        Solves the fitted trajectory for the point where it reaches the floor.
+
+        Returns:
+        - (landing_x, landing_y, landing_std, time_to_landing), or None if
+          there are not enough positions or the ball is not coming down to the
+          floor. landing_x and landing_y are floor coordinates (in meters),
+          landing_std the 1-sigma radial uncertainty of that point (in
+          meters), and time_to_landing is measured from the newest position.
+        """
+        fit = self.fit()
+        if fit is None:
+            return None
+        position, velocity, inverse_normal, residual_variances = fit
+        t_land = first_crossing(-0.5 * self.gravity, velocity[2], position[2] - self.floor_height, 0.0)
+        if t_land is None:
+            return None
+        landing_x, landing_y = position[:2] + velocity[:2] * t_land
+
+        u = np.array([1.0, t_land])
+        spread = u @ inverse_normal @ u
+        slope = velocity[2] - self.gravity * t_land
+        t_variance = residual_variances[2] * spread / (slope * slope) if slope else math.inf
+        landing_variance = (residual_variances[0] + residual_variances[1]) * spread + \
+            (velocity[0] ** 2 + velocity[1] ** 2) * t_variance
+        return float(landing_x), float(landing_y), math.sqrt(landing_variance), float(t_land)
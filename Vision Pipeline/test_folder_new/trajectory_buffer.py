@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class TrajectoryBuffer:
+    def __init__(self, capacity=50):
+        """
+        Fixed-capacity history of (x, y) positions and their timestamps.
+
+        Every sample is written twice, at index i and i + capacity, so the
+        most recent samples always form one contiguous slice. points,
+        pixels and timestamps are therefore views, oldest first, and never
+        copy; they are only valid until the next append.
+
+        Parameters:
+        - capacity: Maximum number of samples kept.
+        """
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        self.capacity = capacity
+        self._points = np.zeros((2 * capacity, 2), np.float64)
+        self._pixels = np.zeros((2 * capacity, 1, 2), np.int32)  # Layout expected by cv2.polylines
+        self._timestamps = np.zeros(2 * capacity, np.float64)
+        self.count = 0  # Samples currently held
+        self.end = capacity  # One past the newest sample, in [capacity, 2 * capacity]
+
+    def append(self, point, timestamp=0.0):
+        """
+        Adds a position, overwriting the oldest one once the buffer is full.
+        """
+        index = self.end % self.capacity
+        for i in (index, index + self.capacity):
+            self._points[i] = point
+            self._pixels[i, 0] = (int(round(point[0])), int(round(point[1])))
+            self._timestamps[i] = timestamp
+        self.end = index + self.capacity + 1
+        self.count = min(self.count + 1, self.capacity)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def points(self):
+        """
+        Float (n, 2) view of the positions.
+        """
+        return self._points[self.end - self.count:self.end]
+
+    @property
+    def pixels(self):
+        """
+        Rounded int32 (n, 1, 2) view of the positions, ready for cv2.polylines.
+        """
+        return self._pixels[self.end - self.count:self.end]
+
+    @property
+    def timestamps(self):
+        """
+        (n,) view of the timestamps.
+        """
+        return self._timestamps[self.end - self.count:self.end]
+
+    def oldest(self):
+        """
+        Returns the ((x, y), timestamp) sample the next append overwrites once full.
+        """
+        start = self.end - self.count
+        return self._points[start], self._timestamps[start]
+
+    def clear(self):
+        self.count = 0
+        self.end = self.capacity
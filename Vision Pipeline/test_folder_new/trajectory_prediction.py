@@ -1,25 +1,189 @@
+import math
 import numpy as np
-from sklearn.linear_model import LinearRegression
+from trajectory_buffer import TrajectoryBuffer
+
+
+def first_crossing(a, b, c, t_min):
+    """
+    Returns the earliest root of a t^2 + b t + c = 0 at or after t_min, or None.
+    """
+    if abs(a) < 1e-12:
+        if abs(b) < 1e-12:
+            return None
+        roots = [-c / b]
+    else:
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            return None
+        sqrt_discriminant = math.sqrt(discriminant)
+        roots = [(-b - sqrt_discriminant) / (2 * a), (-b + sqrt_discriminant) / (2 * a)]
+    future = [root for root in roots if root >= t_min]
+    return min(future) if future else None
+
 
 class TrajectoryPredictor:
-    def __init__(self):
-        self.positions = []  # List of (x, y) tuples
-    
-    def update_positions(self, position):
-        self.positions.append(position)
-        if len(self.positions) > 10:  # Limit -mto the last 10 positions
-            self.positions.pop(0)
-    
+    def __init__(self, window=10, max_misses=5, max_residual_std=10.0):
+        """
+        Predicts where the ball crosses the floor line from its recent positions.
+
+        x(t) is fitted with a line and y(t) with a parabola (gravity) by least
+        squares over a sliding window. The fits are kept as running sums of
+        powers of t, so each new position costs O(1) and the landing point is
+        solved in closed form.
+
+        A flight ends when the ball is missed max_misses times in a row (see
+        miss()); the window is then cleared, so the next throw is not fitted
+        together with the last one.
+
+        Parameters:
+        - window: Number of most recent positions used for the fit.
+        - max_misses: Consecutive missed detections that end a flight (use the
+          detector's max_misses).
+        - max_residual_std: Largest RMS deviation of the positions from the
+          fitted y(t) parabola (in pixels) for which a landing is predicted.
+        """
+        if window < 3:
+            raise ValueError("Window must hold at least 3 positions.")
+        self.window = window
+        self.max_misses = max_misses
+        self.max_residual_std = max_residual_std
+        self.misses = 0
+        self.positions = TrajectoryBuffer(window)  # Positions with their absolute timestamps
+        self.origin = None  # Time origin of the running sums
+        self.sample_count = 0
+        self.updates_since_rebase = 0
+        self._reset_sums()
+
+    def _reset_sums(self):
+        self.t_sums = [0.0] * 5  # sum(t^k), k = 0..4
+        self.x_sums = [0.0] * 2  # sum(x * t^k), k = 0..1
+        self.y_sums = [0.0] * 3  # sum(y * t^k), k = 0..2
+        self.xx_sum = 0.0
+        self.yy_sum = 0.0
+
+    def _accumulate(self, t, x, y, sign):
+        power = 1.0
+        for k in range(5):
+            self.t_sums[k] += sign * power
+            if k < 2:
+                self.x_sums[k] += sign * x * power
+            if k < 3:
+                self.y_sums[k] += sign * y * power
+            power *= t
+        self.xx_sum += sign * x * x
+        self.yy_sum += sign * y * y
+
+    def update_positions(self, position, timestamp=None):
+        """
+        Adds a detected position to the sliding window.
+
+        Parameters:
+        - position: The detected (x, y) center (in pixels).
+        - timestamp: Capture time (in seconds). If None, the sample index is used
+          and times are expressed in frames.
+        """
+        if timestamp is None:
+            timestamp = self.sample_count
+        self.sample_count += 1
+        self.misses = 0
+        if self.origin is None:
+            self.origin = timestamp
+
+        if len(self.positions) == self.window:
+            # Remove the sample that the append below overwrites
+            (old_x, old_y), old_timestamp = self.positions.oldest()
+            self._accumulate(old_timestamp - self.origin, old_x, old_y, -1.0)
+        x, y = float(position[0]), float(position[1])
+        self.positions.append((x, y), timestamp)
+        self._accumulate(timestamp - self.origin, x, y, 1.0)
+
+        # Move the time origin to the window start once per window so the
+        # powers of t stay small; amortized this is still O(1) per position.
+        self.updates_since_rebase += 1
+        if self.updates_since_rebase >= self.window:
+            self._rebase()
+
+    def _rebase(self):
+        self.origin = self.positions.timestamps[0]
+        self._reset_sums()
+        for (x, y), timestamp in zip(self.positions.points, self.positions.timestamps):
+            self._accumulate(timestamp - self.origin, x, y, 1.0)
+        self.updates_since_rebase = 0
+
+    def miss(self):
+        """
+        Records a frame without a detection; returns True if it ended the flight and reset the window.
+        """
+        self.misses += 1
+        if self.misses != self.max_misses:
+            return False
+        self.reset()
+        return True
+
+    def reset(self):
+        self.positions.clear()
+        self.origin = None
+        self.updates_since_rebase = 0
+        self._reset_sums()
+
+    def estimate_landing(self, floor_y):
+        """
+        Solves the fitted trajectory for the point where it reaches floor_y.
+
+        Parameters:
+        - floor_y: Image row of the floor (in pixels).
+
+        Returns:
+        - (landing_x, landing_std, time_to_landing), or None if there are not
+          enough positions, the fit is implausible (a parabola opening upwards,
+          against gravity, or positions further than max_residual_std from
+          it) or the fitted arc never reaches the floor.
+          landing_std is the 1-sigma uncertainty of landing_x (in pixels), or
+          None while the window holds too few positions to estimate it.
+          time_to_landing is measured from the newest position.
+        """
+        n = len(self.positions)
+        if n < 3:  # Not enough data to predict
+            return None
+
+        S = self.t_sums
+        y_normal = np.array([[S[0], S[1], S[2]], [S[1], S[2], S[3]], [S[2], S[3], S[4]]])
+        x_normal = y_normal[:2, :2]
+        try:
+            y_inverse = np.linalg.inv(y_normal)
+            x_inverse = np.linalg.inv(x_normal)
+        except np.linalg.LinAlgError:  # Repeated timestamps
+            return None
+        c, b, a = y_inverse @ self.y_sums  # y(t) = a t^2 + b t + c
+        e, d = x_inverse @ self.x_sums  # x(t) = d t + e
+        if a <= 0:  # Image y points down, so gravity bends the arc towards larger y
+            return None
+        y_variance = None
+        if n > 3:
+            y_variance = max(self.yy_sum - (c * self.y_sums[0] + b * self.y_sums[1] + a * self.y_sums[2]), 0.0) / (n - 3)
+            if y_variance > self.max_residual_std ** 2:
+                return None
+
+        t_last = self.positions.timestamps[-1] - self.origin
+        t_land = first_crossing(a, b, c - floor_y, t_last)
+        if t_land is None:
+            return None
+        landing_x = e + d * t_land
+
+        landing_std = None
+        if y_variance is not None:
+            x_variance = max(self.xx_sum - (e * self.x_sums[0] + d * self.x_sums[1]), 0.0) / (n - 2)
+            u = np.array([1.0, t_land])
+            v = np.array([1.0, t_land, t_land * t_land])
+            y_at_landing_variance = y_variance * (v @ y_inverse @ v)
+            slope = 2 * a * t_land + b
+            t_variance = y_at_landing_variance / (slope * slope) if slope else math.inf
+            landing_std = math.sqrt(float(x_variance * (u @ x_inverse @ u) + d * d * t_variance))
+
+        return float(landing_x), landing_std, float(t_land - t_last)
+
     def predict_landing(self, floor_y):
-        if len(self.positions) < 3:  # Not enough data to predict
+        landing = self.estimate_landing(floor_y)
+        if landing is None:
             return None
-        
-        recent_positions = np.array(self.positions)
-        x_vals = recent_positions[:, 0].reshape(-1, 1)
-        y_vals = recent_positions[:, 1]
-        
-        model = LinearRegression()
-        model.fit(x_vals, y_vals)
-        predicted_x = model.predict([[floor_y]])
-        
-        return int(predicted_x[0])
+        return int(landing[0])
@@ -1,17 +1,48 @@
 import cv2
+import numpy as np
+from trajectory_buffer import TrajectoryBuffer
 
 class Visualizer:
     def draw_ball_info(self, frame, center, bounding_box):
         if center and bounding_box:
             x, y, w, h = bounding_box
             cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.circle(frame, center, 5, (0, 0, 255), -1)
-            cv2.putText(frame, f"Center: {center}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            # Centers are float centroids; OpenCV draws at integer pixels
+            cv2.circle(frame, (int(round(center[0])), int(round(center[1]))), 5, (0, 0, 255), -1)
+            cv2.putText(frame, f"Center: ({center[0]:.1f}, {center[1]:.1f})", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, (0, 255, 0), 2)
     
     def draw_trajectory(self, frame, points, color):
+        # One polyline call; a TrajectoryBuffer is drawn straight from its pixel view
         if len(points) > 1:
-            for i in range(1, len(points)):
-                cv2.line(frame, points[i - 1], points[i], color, 2)
+            pixels = points.pixels if isinstance(points, TrajectoryBuffer) else np.int32(points).reshape(-1, 1, 2)
+            cv2.polylines(frame, [pixels], False, color, 2)
+
+    def draw_landing(self, frame, pixel, label):
+        # Landing target projected into the image (None if it is behind the camera)
+        if pixel is not None:
+            cv2.drawMarker(frame, (int(round(pixel[0])), int(round(pixel[1]))), (0, 0, 255), cv2.MARKER_CROSS, 30, 2)
+        cv2.putText(frame, label, (10, 180), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+
+    def compute_metrics(self, trail, predicted_trail, count=5):
+        """
+        Compares the last detected positions with the last predicted positions.
+
+        Parameters:
+        - trail: TrajectoryBuffer of detected centers.
+        - predicted_trail: TrajectoryBuffer of predicted centers.
+        - count: Number of most recent positions compared.
+
+        Returns:
+        - mse: Mean squared distance (in pixels^2), or None with too few positions.
+        - accuracy: Percentage of predictions within 10 pixels in x and y, or None.
+        """
+        if len(trail) <= count or len(predicted_trail) <= count:
+            return None, None
+        difference = trail.points[-count:] - predicted_trail.points[-count:]
+        mse = float(np.mean(np.sum(difference * difference, axis=1)))
+        accuracy = float(np.mean(np.all(np.abs(difference) <= 10, axis=1))) * 100
+        return mse, accuracy
     
     def display_metrics(self, frame, fps, mse, accuracy):
         cv2.putText(frame, f"FPS: {fps:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
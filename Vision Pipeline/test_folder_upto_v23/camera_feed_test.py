@@ -23,11 +23,11 @@ class CameraFeed:
         atexit.register(self.release)
 
     def get_frame(self):
-        # Enforce frame rate
-        now = time.time()
-        while now - self.last_frame_time < self.frame_delay:
-            now = time.time()
-        self.last_frame_time = now
+        # Enforce frame rate by sleeping off the remainder instead of spinning
+        remaining = self.frame_delay - (time.time() - self.last_frame_time)
+        if remaining > 0:
+            time.sleep(remaining)
+        self.last_frame_time = time.time()
         
         ret, frame = self.cap.read()
         if not ret:
@@ -1,3 +1,5 @@
+import os
+import sys
 import time
 import cv2
 from camera_feed_test import CameraFeed
@@ -6,6 +8,11 @@ from motion_tracking_test import MotionTracker
 from trajectory_prediction_test import TrajectoryPredictor
 from visualization_test import Visualizer
 from single_camera_distance_test import SingleCameraDistanceEstimator
+# Paths are relative to this script, not to the working directory
+script_dir = os.path.dirname(os.path.abspath(__file__))
+# The telemetry sink is shared with test_folder_new rather than copied; appended, so this folder's modules win
+sys.path.append(os.path.join(script_dir, "..", "test_folder_new"))
+from telemetry import TelemetrySink
 
 # Initialize components
 camera = CameraFeed(width=1200, height=720)
@@ -14,6 +21,9 @@ tracker = MotionTracker()
 predictor = TrajectoryPredictor()
 visualizer = Visualizer()
 distance_estimator = SingleCameraDistanceEstimator(known_width=0.2, focal_length=800)
+# Same "x, y" lines as before, written in batches from a background thread
+landing_log = TelemetrySink(os.path.join(script_dir, "landing_positions.txt"), ["mapped_x", "mapped_y"], header=False,
+                            delimiter=", ", float_format=".2f")
 
 # Initialize runtime variables
 trail_points = []
@@ -49,8 +59,7 @@ try:
         predicted_landing = predictor.predict_landing(floor_y=720)  # Assuming floor is at y=720
         if predicted_landing:
             mapped_x, mapped_y = predictor.map_to_square(predicted_landing, square_size=2)
-            with open("landing_positions.txt", "a") as file:
-                file.write(f"{mapped_x:.2f}, {mapped_y:.2f}\n")
+            landing_log.write(mapped_x, mapped_y)
             visualizer.draw_landing_point(frame, mapped_x, mapped_y, square_size=2)
 
         # Step 5: Visualize real-time and predicted trajectories
@@ -90,3 +99,4 @@ finally:
     # Release all resources
     camera.release()
     camera.close_windows()
+    landing_log.close()